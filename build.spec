@@ -26,6 +26,7 @@ a = Analysis(
         ('resources/docs', 'resources/docs'),
         ('src/i18n.py', '.'),
         ('src/version.py', '.'),
+        ('src/gui/app.qss', 'gui'),
     ],
     hiddenimports=[
         'PyQt5',
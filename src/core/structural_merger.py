@@ -12,7 +12,15 @@ Structural Merger - Полноценный структурный мерж Parad
 Событие - атомарная единица. Либо из базы, либо целиком из мода.
 """
 
+import codecs
+import hashlib
 import re
+import string
+import sys
+from bisect import bisect_right
+from functools import lru_cache
+from itertools import accumulate, chain
+from operator import sub
 from typing import Dict, List, Set, Tuple, Optional, Any
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -28,27 +36,66 @@ from .paradox_rules import (
     is_top_level_atomic,
     get_file_context,
     get_top_level_strategy,
+    is_gui_background_container,
     SAFE_LIST_BLOCKS,
     NO_MERGE_BLOCKS,
     StructureValidator
 )
 
 
-@dataclass
 class ParsedBlock:
-    """Распарсенный блок"""
-    name: str
-    full_text: str  # Полный текст включая name = { ... }
-    inner_text: str  # Только содержимое между { }
-    start_line: int
-    end_line: int
-    indent: str
-    is_commented: bool = False
-    # Дети группируются по имени, но сохраняем ВСЕ блоки с одинаковым именем
-    # if[0], if[1], if[2] - все сохранены в списке
-    children: Dict[str, List['ParsedBlock']] = field(default_factory=dict)
-    list_items: List[str] = field(default_factory=list)  # Для списков типа on_actions
-    properties: Dict[str, str] = field(default_factory=dict)  # name = value
+    """
+    Распарсенный блок.
+    
+    Обычный класс со __slots__ вместо @dataclass: в большом файле тысячи
+    блоков, и __dict__ у каждого заметно увеличивает дерево разбора.
+    (dataclass(slots=True) требует Python 3.10.)
+    """
+    __slots__ = (
+        'name', 'full_text', 'inner_text', 'start_line', 'end_line', 'indent',
+        'is_commented', 'children', 'list_items', 'properties',
+        'start_offset', 'end_offset', 'header_end', '_norm', '_fingerprint'
+    )
+    
+    def __init__(self, name: str, full_text: str, inner_text: str,
+                 start_line: int, end_line: int, indent: str,
+                 is_commented: bool = False,
+                 children: Optional[Dict[str, List['ParsedBlock']]] = None,
+                 list_items: Optional[List[str]] = None,
+                 properties: Optional[Dict[str, str]] = None,
+                 start_offset: int = 0, end_offset: int = 0, header_end: int = 0):
+        self.name = name
+        self.full_text = full_text  # Полный текст включая name = { ... }
+        self.inner_text = inner_text  # Только содержимое между { }
+        self.start_line = start_line
+        self.end_line = end_line
+        self.indent = indent
+        self.is_commented = is_commented
+        # Дети группируются по имени, но сохраняем ВСЕ блоки с одинаковым именем
+        # if[0], if[1], if[2] - все сохранены в списке
+        self.children: Dict[str, List['ParsedBlock']] = children if children is not None else {}
+        self.list_items: List[str] = list_items if list_items is not None else []  # Для списков типа on_actions
+        self.properties: Dict[str, str] = properties if properties is not None else {}  # name = value
+        # Смещения full_text в исходном тексте файла
+        self.start_offset = start_offset
+        self.end_offset = end_offset
+        # Длина заголовка "name = {" в full_text (до содержимого)
+        self.header_end = header_end
+        # Кэш нормализованного inner_text (см. normalized)
+        self._norm: Optional[str] = None
+        # Кэш отпечатка для дедупликации GUI блоков (см. _block_fingerprint)
+        self._fingerprint: Optional[bytes] = None
+    
+    def __repr__(self) -> str:
+        return (f"ParsedBlock(name={self.name!r}, start_line={self.start_line}, "
+                f"end_line={self.end_line}, children={list(self.children)})")
+    
+    @property
+    def normalized(self) -> str:
+        """Нормализованное содержимое для сравнения (считается один раз)"""
+        if self._norm is None:
+            self._norm = _normalize_content(self.inner_text)
+        return self._norm
     
     def get_child(self, name: str, index: int = 0) -> Optional['ParsedBlock']:
         """Получить дочерний блок по имени и индексу"""
@@ -71,9 +118,135 @@ class ParsedBlock:
         return len(self.children.get(name, []))
 
 
+# Идентификатор Paradox: name, 5120, 1066.1.1, namespace.0001, character:xxx
+_IDENT = r'[a-zA-Z0-9_][a-zA-Z0-9_.:]*'
+
+# То же без регулярки: допустимые символы и допустимое начало идентификатора
+_IDENT_CHARS = string.ascii_letters + string.digits + '_.:'
+_IDENT_START = frozenset(string.ascii_letters + string.digits + '_')
+
+# Начало блока: name = {
+_BLOCK_OPEN_RE = re.compile(rf'({_IDENT})\s*=\s*\{{')
+
+# Строка внутри блока - одна регулярка на строку, тип по lastgroup:
+# block (name = { ...), value (name = value), item (name # комментарий)
+_STATEMENT_RE = re.compile(
+    rf'(?P<name>{_IDENT})\s*'
+    r'(?:=\s*(?:\{(?P<block>.*)|(?P<value>[^{].*))|(?P<item>(?:#.*)?))$'
+)
+
+# Комментарий до конца строки (без учёта кавычек)
+_COMMENT_TAIL_RE = re.compile(r'#[^\n]*')
+
+# Строка в кавычках (группа 1) или комментарий - по тем же правилам, что
+# _find_comment_start: кавычка после обратного слэша не считается, строка
+# в кавычках кончается с концом строки файла
+_QUOTED_OR_COMMENT_RE = re.compile(
+    r'((?<!\\)"(?:[^"\n]|(?<=\\)")*(?:"|$))|#[^\n]*',
+    re.MULTILINE
+)
+
+# Пробелы в начале и в конце каждой строки (кроме самого \n)
+_LINE_EDGE_WS_RE = re.compile(r'^[^\S\n]+|[^\S\n]+$', re.MULTILINE)
+
+# Начало непустой строки
+_NONEMPTY_LINE_RE = re.compile(r'^(?=.)', re.MULTILINE)
+
+# Отступ строки, которая начинается не с комментария
+_ITEM_INDENT_RE = re.compile(r'^([^\S\n]*)[^\s#]', re.MULTILINE)
+
+# Скобки в списке со вложенными блоками
+_BRACE_RE = re.compile(r'[{}]')
+
+
+def _find_comment_start(line: str) -> int:
+    """Находит начало комментария (# вне кавычек)"""
+    # Перескакиваем между кавычками и # через find вместо обхода по символам
+    in_quotes = False
+    pos = 0
+    while True:
+        quote_pos = line.find('"', pos)
+        if not in_quotes:
+            hash_pos = line.find('#', pos, quote_pos if quote_pos >= 0 else len(line))
+            if hash_pos >= 0:
+                return hash_pos
+        if quote_pos < 0:
+            return -1
+        # Кавычка после обратного слэша не переключает состояние
+        if quote_pos == 0 or line[quote_pos - 1] != '\\':
+            in_quotes = not in_quotes
+        pos = quote_pos + 1
+
+
+def _strip_comment(line: str) -> str:
+    """Отрезает комментарий (# вне кавычек)"""
+    hash_pos = line.find('#')
+    if hash_pos < 0:
+        return line
+    # Без кавычек перед первым # - это точно начало комментария
+    if line.find('"', 0, hash_pos) < 0:
+        return line[:hash_pos]
+    hash_pos = _find_comment_start(line)
+    return line[:hash_pos] if hash_pos >= 0 else line
+
+
+def _normalize_content(content: str) -> str:
+    """Нормализует содержимое для сравнения"""
+    # Убираем комментарии
+    lines = []
+    for line in content.split('\n'):
+        line = _strip_comment(line).strip()
+        if line:
+            lines.append(line)
+    
+    return ' '.join(lines)
+
+
+class _LineTable:
+    """
+    Таблица строк исходного текста (результат _tokenize).
+    
+    Хранит строки, их смещения, баланс скобок каждой строки (без комментариев)
+    и для каждой строки - где закрывается открытый в ней уровень. Вложенные
+    уровни читают эти данные вместо повторного split и подсчёта скобок;
+    крайние строки уровня обрезаются по границам его inner_text.
+    """
+    
+    def __init__(self, content: str, lines: List[str], starts: List[int],
+                 brace_deltas: List[int], closes: List[int],
+                 open_braces: int, close_braces: int):
+        self.content = content
+        self.lines = lines
+        self.starts = starts
+        self.brace_deltas = brace_deltas
+        # Всего скобок в тексте (без комментариев)
+        self.open_braces = open_braces
+        self.close_braces = close_braces
+        # closes[k] - первая строка t > k, перед которой баланс скобок
+        # опускается ниже баланса перед строкой k (-1 если такой нет)
+        self.closes = closes
+    
+    def line_at(self, pos: int) -> int:
+        """Индекс строки, содержащей смещение pos"""
+        return bisect_right(self.starts, pos) - 1
+    
+    def text(self, idx: int, lo: int, hi: int) -> str:
+        """Строка idx, обрезанная по [lo, hi)"""
+        line = self.lines[idx]
+        start = self.starts[idx]
+        end = start + len(line)
+        if lo <= start and end <= hi:
+            return line
+        return self.content[max(start, lo):min(end, hi)]
+
+
 @dataclass 
 class MergeChange:
     """Описание изменения"""
+    # Полей без значений по умолчанию - __slots__ совместимы с @dataclass
+    # и на Python 3.8; изменений в большом мерже тысячи
+    __slots__ = ('path', 'change_type', 'mod_name', 'content')
+    
     path: str  # on_game_start.on_actions
     change_type: str  # added_item, added_block, modified, etc.
     mod_name: str
@@ -106,17 +279,18 @@ class StructuralMerger:
         self.changes = []
         
         try:
-            # Читаем базу
-            with open(base_path, 'r', encoding='utf-8-sig') as f:
-                base_content = f.read()
+            # Читаем и парсим базу (разбор кэшируется по пути, mtime и размеру)
+            base_stat = Path(base_path).stat()
+            base_content, base_blocks, base_braces = _parse_base_file(
+                str(base_path), base_stat.st_mtime_ns, base_stat.st_size
+            )
             
             # Читаем моды
             mod_contents = []
             for mod_name, mod_path in mod_paths:
-                with open(mod_path, 'r', encoding='utf-8-sig') as f:
-                    mod_contents.append((mod_name, f.read()))
+                mod_contents.append((mod_name, self._read_file(mod_path)))
             
-            return self.merge_contents(base_content, mod_contents)
+            return self._merge_parsed(base_content, base_blocks, base_braces, mod_contents)
             
         except Exception as e:
             return StructuralMergeResult(
@@ -124,20 +298,66 @@ class StructuralMerger:
                 error=f"Ошибка чтения файла: {str(e)}"
             )
     
+    def _read_file(self, path: Path) -> str:
+        """
+        Читает файл как UTF-8 (BOM отбрасывается), переводы строк - в \\n.
+        Байты декодируются один раз; замена переводов строк только если есть \\r.
+        """
+        raw = Path(path).read_bytes()
+        if raw.startswith(codecs.BOM_UTF8):
+            raw = raw[len(codecs.BOM_UTF8):]
+        content = raw.decode('utf-8')
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content
+    
     def merge_contents(self, base_content: str, mod_contents: List[Tuple[str, str]], filename: str = "") -> StructuralMergeResult:
         """Мержит содержимое файлов с учётом правил Paradox"""
         try:
-            # Нормализуем
+            # Нормализуем и парсим базу
             base_content = base_content.replace('\r\n', '\n')
+            base_table = self._tokenize(base_content)
+            base_blocks = self._parse_top_level_blocks(base_content, base_table)
+        except Exception as e:
+            import traceback
+            return StructuralMergeResult(
+                success=False,
+                error=f"Ошибка мержа: {str(e)}\n{traceback.format_exc()}"
+            )
+        
+        return self._merge_parsed(
+            base_content,
+            base_blocks,
+            (base_table.open_braces, base_table.close_braces),
+            mod_contents,
+            filename
+        )
+    
+    def _merge_parsed(self, base_content: str, base_blocks: Dict[str, ParsedBlock],
+                      base_braces: Tuple[int, int], mod_contents: List[Tuple[str, str]],
+                      filename: str = "") -> StructuralMergeResult:
+        """
+        Мержит моды в уже разобранную базу.
+        
+        Args:
+            base_content: Текст базы (переводы строк уже нормализованы)
+            base_blocks: Блоки верхнего уровня базы (не изменяются)
+            base_braces: Число '{' и '}' в базе без комментариев
+            mod_contents: [(mod_name, content), ...] в порядке приоритета
+            filename: Путь файла (для контекста правил)
+        """
+        try:
+            # Нормализуем
             mod_contents = [(name, content.replace('\r\n', '\n')) for name, content in mod_contents]
             
-            # Парсим базу
-            base_blocks = self._parse_top_level_blocks(base_content)
-            
             # Парсим моды и собираем изменения
             all_changes: Dict[str, List[Tuple[str, str, Any]]] = {}  # block_name -> [(mod_name, change_type, parsed)]
             
             for mod_name, mod_content in mod_contents:
+                # Мод с копией базы ничего не меняет - не парсим его вовсе
+                if mod_content == base_content:
+                    continue
+                
                 mod_blocks = self._parse_top_level_blocks(mod_content)
                 
                 for block_name, mod_block in mod_blocks.items():
@@ -161,6 +381,10 @@ class StructuralMerger:
             # Применяем изменения к базе
             result_content = base_content
             
+            # Баланс скобок результата: база посчитана при разборе,
+            # дальше учитываем только разницу от каждой правки
+            open_braces, close_braces = base_braces
+            
             for block_name, changes in all_changes.items():
                 base_block = base_blocks.get(block_name)
                 
@@ -172,6 +396,9 @@ class StructuralMerger:
                     # Уникальные блоки ВСЕГДА накапливаются (независимо от типа)
                     last_mod_name, _, last_mod_block = changes[-1]
                     result_content = result_content.rstrip() + '\n\n' + last_mod_block.full_text
+                    added_open, added_close = self._count_braces(last_mod_block.full_text)
+                    open_braces += added_open
+                    close_braces += added_close
                     self.changes.append(MergeChange(
                         path=block_name,
                         change_type='added_unique_block',
@@ -184,11 +411,13 @@ class StructuralMerger:
                     # Одинаковые блоки: берём целиком из последнего мода
                     # Внутренности НЕ мержим
                     last_mod_name, _, last_mod_block = changes[-1]
-                    result_content = result_content.replace(
+                    result_content, delta_open, delta_close = self._replace_counted(
+                        result_content,
                         base_block.full_text,
-                        last_mod_block.full_text,
-                        1
+                        last_mod_block.full_text
                     )
+                    open_braces += delta_open
+                    close_braces += delta_close
                     self.changes.append(MergeChange(
                         path=block_name,
                         change_type='replaced_atomic',
@@ -201,16 +430,22 @@ class StructuralMerger:
                     # Мержим внутренности по правилам
                     mod_blocks_list = [(name, block) for name, _, block in changes]
                     merged_text = self._deep_merge_block(base_block, mod_blocks_list)
-                    result_content = result_content.replace(base_block.full_text, merged_text, 1)
+                    result_content, delta_open, delta_close = self._replace_counted(
+                        result_content, base_block.full_text, merged_text
+                    )
+                    open_braces += delta_open
+                    close_braces += delta_close
                 
                 else:
                     # Fallback - атомарный
                     last_mod_name, _, last_mod_block = changes[-1]
-                    result_content = result_content.replace(
+                    result_content, delta_open, delta_close = self._replace_counted(
+                        result_content,
                         base_block.full_text,
-                        last_mod_block.full_text,
-                        1
+                        last_mod_block.full_text
                     )
+                    open_braces += delta_open
+                    close_braces += delta_close
                     self.changes.append(MergeChange(
                         path=block_name,
                         change_type='replaced_fallback',
@@ -232,12 +467,11 @@ class StructuralMerger:
                         content=issue.message
                     ))
             
-            # Проверка баланса скобок
-            if not self._validate_braces(result_content):
-                open_c, close_c = self._count_braces(result_content)
+            # Проверка баланса скобок (по накопленным счётчикам)
+            if open_braces != close_braces:
                 return StructuralMergeResult(
                     success=False,
-                    error=f"Несбалансированные скобки после мержа: {{ = {open_c}, }} = {close_c}"
+                    error=f"Несбалансированные скобки после мержа: {{ = {open_braces}, }} = {close_braces}"
                 )
             
             return StructuralMergeResult(
@@ -253,10 +487,47 @@ class StructuralMerger:
                 error=f"Ошибка мержа: {str(e)}\n{traceback.format_exc()}"
             )
     
-    def _parse_top_level_blocks(self, content: str) -> Dict[str, ParsedBlock]:
+    def _tokenize(self, content: str) -> _LineTable:
+        """
+        Один проход по тексту: строки, их смещения и баланс скобок.
+        Результат переиспользуется всеми уровнями вложенности, а общие
+        счётчики скобок - для проверки баланса результата мержа.
+        """
+        lines = content.split('\n')
+        starts = list(accumulate([len(line) + 1 for line in lines], initial=0))
+        
+        # Скобки каждой строки без комментариев
+        open_counts = []
+        close_counts = []
+        for line in lines:
+            if '#' in line:
+                line = _strip_comment(line)
+            open_counts.append(line.count('{'))
+            close_counts.append(line.count('}'))
+        brace_deltas = list(map(sub, open_counts, close_counts))
+        
+        # Конец каждого уровня через префиксные суммы и монотонный стек:
+        # depth_before[k] - баланс скобок перед строкой k
+        depth_before = list(accumulate(brace_deltas, initial=0))
+        closes = [-1] * len(depth_before)
+        stack = []
+        for k, depth in enumerate(depth_before):
+            while stack and depth_before[stack[-1]] > depth:
+                closes[stack.pop()] = k
+            stack.append(k)
+        
+        return _LineTable(
+            content, lines, starts, brace_deltas, closes,
+            sum(open_counts), sum(close_counts)
+        )
+    
+    def _parse_top_level_blocks(self, content: str, table: Optional[_LineTable] = None) -> Dict[str, ParsedBlock]:
         """Парсит блоки верхнего уровня"""
         blocks = {}
-        lines = content.split('\n')
+        if table is None:
+            table = self._tokenize(content)
+        lines = table.lines
+        brace_deltas = table.brace_deltas
         
         i = 0
         header_lines = []
@@ -274,51 +545,39 @@ class StructuralMerger:
             
             # Ищем начало блока
             # Поддерживаем: name = {, 5120 = {, 1066.1.1 = {
-            match = re.match(r'^([a-zA-Z0-9_][a-zA-Z0-9_\.:]*)\s*=\s*\{', stripped)
+            match = _BLOCK_OPEN_RE.match(stripped)
             if match:
-                block_name = match.group(1)
+                # Имена из небольшого словаря - интернируем (одна строка на имя)
+                block_name = sys.intern(match.group(1))
                 indent = line[:len(line) - len(line.lstrip())]
                 start_line = i
                 
-                # Находим конец блока
+                # Находим конец блока (баланс скобок строк уже посчитан)
                 brace_depth = 0
-                block_lines = []
                 
                 while i < len(lines):
-                    block_line = lines[i]
-                    block_lines.append(block_line)
-                    
-                    # Считаем скобки без комментариев
-                    line_for_count = block_line
-                    if '#' in line_for_count:
-                        hash_pos = self._find_comment_start(line_for_count)
-                        if hash_pos >= 0:
-                            line_for_count = line_for_count[:hash_pos]
-                    
-                    brace_depth += line_for_count.count('{') - line_for_count.count('}')
+                    brace_depth += brace_deltas[i]
                     i += 1
                     
                     if brace_depth <= 0:
                         break
                 
-                full_text = '\n'.join(block_lines)
-                
-                # Извлекаем inner_text
-                inner_start = full_text.find('{') + 1
-                inner_end = full_text.rfind('}')
-                inner_text = full_text[inner_start:inner_end] if inner_end > inner_start else ""
+                start_offset = table.starts[start_line]
+                end_offset = table.starts[i - 1] + len(lines[i - 1])
                 
                 block = ParsedBlock(
                     name=block_name,
-                    full_text=full_text,
-                    inner_text=inner_text,
+                    full_text=content[start_offset:end_offset],
+                    inner_text='',
                     start_line=start_line,
                     end_line=i - 1,
-                    indent=indent
+                    indent=indent,
+                    start_offset=start_offset,
+                    end_offset=end_offset
                 )
                 
                 # Парсим содержимое блока
-                self._parse_block_contents(block)
+                self._parse_block_contents(block, table)
                 
                 blocks[block_name] = block
             else:
@@ -337,181 +596,208 @@ class StructuralMerger:
         
         return blocks
     
-    def _parse_block_contents(self, block: ParsedBlock):
-        """Парсит содержимое блока - находит вложенные блоки, списки, свойства"""
-        content = block.inner_text
-        lines = content.split('\n')
+    def _parse_block_contents(self, block: ParsedBlock, table: _LineTable):
+        """
+        Парсит содержимое блока - находит вложенные блоки, списки, свойства.
         
-        i = 0
-        while i < len(lines):
-            line = lines[i]
-            stripped = line.strip()
+        Вместо рекурсии с повторным split(inner_text) обходим вложенные блоки
+        через стек, читая строки и их баланс скобок из общей таблицы.
+        """
+        content = table.content
+        lines = table.lines
+        closes = table.closes
+        stack = [block]
+        
+        while stack:
+            current = stack.pop()
             
-            if not stripped or stripped.startswith('#'):
-                i += 1
-                continue
+            # Извлекаем inner_text по смещениям full_text
+            inner_start = content.find('{', current.start_offset, current.end_offset) + 1
+            inner_end = content.rfind('}', current.start_offset, current.end_offset)
+            current.inner_text = content[inner_start:inner_end] if inner_end > inner_start else ""
+            current.header_end = inner_start - current.start_offset if inner_start else 0
             
-            # Вложенный блок
-            match = re.match(r'^([a-zA-Z0-9_][a-zA-Z0-9_\.:]*)\s*=\s*\{(.*)$', stripped)
-            if match:
-                child_name = match.group(1)
-                rest = match.group(2)
+            if current.inner_text:
+                first = table.line_at(inner_start)
+                last = table.line_at(inner_end)
+            else:
+                first, last = 0, -1
+            
+            i = first
+            while i <= last:
+                line = lines[i] if first < i < last else table.text(i, inner_start, inner_end)
+                stripped = line.strip()
                 
-                # Однострочный блок?
-                if rest.rstrip().endswith('}'):
-                    # Извлекаем содержимое однострочного блока
-                    inner = rest.rstrip()[:-1].strip()
-                    
-                    child = ParsedBlock(
-                        name=child_name,
-                        full_text=stripped,
-                        inner_text=inner,
-                        start_line=i,
-                        end_line=i,
-                        indent=line[:len(line) - len(stripped)]
-                    )
-                    
-                    # Парсим элементы списка
-                    if inner:
-                        child.list_items = self._parse_list_items(inner)
-                    
-                    block.add_child(child)
+                if not stripped or stripped.startswith('#'):
                     i += 1
-                else:
-                    # Многострочный блок
-                    start_i = i
-                    brace_depth = 1
-                    child_lines = [line]
+                    continue
+                
+                match = _STATEMENT_RE.match(stripped)
+                if match is None:
                     i += 1
+                    continue
+                kind = match.lastgroup
+                
+                # Вложенный блок
+                if kind == 'block':
+                    child_name = sys.intern(match.group('name'))
+                    rest = match.group('block')
+                    line_start = max(table.starts[i], inner_start)
                     
-                    while i < len(lines) and brace_depth > 0:
-                        child_line = lines[i]
-                        child_lines.append(child_line)
+                    # Однострочный блок?
+                    if rest.rstrip().endswith('}'):
+                        # Извлекаем содержимое однострочного блока
+                        inner = rest.rstrip()[:-1].strip()
+                        child_start = line_start + len(line) - len(line.lstrip())
+                        
+                        child = ParsedBlock(
+                            name=child_name,
+                            full_text=stripped,
+                            inner_text=inner,
+                            start_line=i - first,
+                            end_line=i - first,
+                            indent=line[:len(line) - len(stripped)],
+                            start_offset=child_start,
+                            end_offset=child_start + len(stripped),
+                            header_end=match.start('block')
+                        )
                         
-                        line_for_count = child_line
-                        if '#' in line_for_count:
-                            hash_pos = self._find_comment_start(line_for_count)
-                            if hash_pos >= 0:
-                                line_for_count = line_for_count[:hash_pos]
+                        # Парсим элементы списка
+                        if inner:
+                            child.list_items = self._parse_list_items(inner)
                         
-                        brace_depth += line_for_count.count('{') - line_for_count.count('}')
+                        current.add_child(child)
                         i += 1
-                    
-                    child_text = '\n'.join(child_lines)
-                    inner_start = child_text.find('{') + 1
-                    inner_end = child_text.rfind('}')
-                    inner_text = child_text[inner_start:inner_end] if inner_end > inner_start else ""
-                    
-                    child = ParsedBlock(
-                        name=child_name,
-                        full_text=child_text,
-                        inner_text=inner_text,
-                        start_line=start_i,
-                        end_line=i - 1,
-                        indent=line[:len(line) - len(stripped)]
-                    )
-                    
-                    # Рекурсивно парсим
-                    self._parse_block_contents(child)
-                    
-                    # Также извлекаем list_items если это похоже на список
-                    child.list_items = self._parse_list_items(inner_text)
-                    
-                    block.add_child(child)
-                continue
-            
-            # Свойство: name = value
-            prop_match = re.match(r'^([a-zA-Z0-9_][a-zA-Z0-9_\.:]*)\s*=\s*([^{].*)$', stripped)
-            if prop_match:
-                prop_name = prop_match.group(1)
-                prop_value = prop_match.group(2).strip()
-                # Убираем комментарий
-                if '#' in prop_value:
-                    prop_value = prop_value[:prop_value.index('#')].strip()
-                block.properties[prop_name] = prop_value
+                    else:
+                        # Многострочный блок - конец берём из таблицы:
+                        # первая строка, где баланс уходит ниже открытого уровня
+                        start_i = i
+                        i += 1
+                        close = closes[i] if i <= last else -1
+                        i = close if 0 < close <= last else last + 1
+                        
+                        child_end = min(table.starts[i - 1] + len(lines[i - 1]), inner_end)
+                        
+                        child = ParsedBlock(
+                            name=child_name,
+                            full_text=content[line_start:child_end],
+                            inner_text='',
+                            start_line=start_i - first,
+                            end_line=i - 1 - first,
+                            indent=line[:len(line) - len(stripped)],
+                            start_offset=line_start,
+                            end_offset=child_end
+                        )
+                        
+                        # Содержимое разберём, когда дойдём до него в стеке
+                        stack.append(child)
+                        current.add_child(child)
+                    continue
+                
+                # Свойство: name = value
+                if kind == 'value':
+                    prop_name = sys.intern(match.group('name'))
+                    prop_value = match.group('value').strip()
+                    # Убираем комментарий
+                    if '#' in prop_value:
+                        prop_value = prop_value[:prop_value.index('#')].strip()
+                    current.properties[prop_name] = prop_value
+                    i += 1
+                    continue
+                
+                # Элемент списка
+                current.list_items.append(match.group('name'))
                 i += 1
-                continue
-            
-            # Элемент списка
-            item_match = re.match(r'^([a-zA-Z0-9_][a-zA-Z0-9_\.:]*)\s*(#.*)?$', stripped)
-            if item_match:
-                block.list_items.append(item_match.group(1))
             
-            i += 1
+            # У вложенных многострочных списков list_items берём из всего
+            # содержимого (включая несколько элементов в одной строке).
+            # Накапливаются только списки из SAFE_LIST_BLOCKS - у остальных
+            # блоков (события, триггеры, эффекты) повторный разбор не нужен
+            if current is not block and current.name in SAFE_LIST_BLOCKS:
+                current.list_items = self._parse_list_items(current.inner_text)
     
     def _parse_list_items(self, content: str) -> List[str]:
         """Извлекает элементы списка"""
-        items = []
-        
         # Убираем комментарии
-        clean_lines = []
-        for line in content.split('\n'):
-            if '#' in line:
-                hash_pos = self._find_comment_start(line)
-                if hash_pos >= 0:
-                    line = line[:hash_pos]
-            clean_lines.append(line)
-        
-        clean_content = ' '.join(clean_lines)
+        clean_content = ' '.join([
+            _strip_comment(line) if '#' in line else line
+            for line in content.split('\n')
+        ])
         
-        # Разбиваем по пробелам, но учитываем вложенные блоки
-        depth = 0
-        current = ""
-        
-        for char in clean_content:
-            if char == '{':
-                depth += 1
-                current += char
-            elif char == '}':
-                depth -= 1
-                current += char
-            elif char in ' \t\n' and depth == 0:
-                if current.strip():
-                    # Проверяем что это не свойство (name = value)
-                    if '=' not in current or '{' in current:
-                        items.append(current.strip())
-                    current = ""
-            else:
-                current += char
-        
-        if current.strip() and ('=' not in current or '{' in current):
-            items.append(current.strip())
+        if '{' not in clean_content and '}' not in clean_content:
+            # Плоский список (on_actions, events) - без скобок глубина не
+            # меняется, достаточно split. Свойства name = value отсеются
+            # ниже: '=' не входит в идентификатор
+            items = clean_content.replace('\t', ' ').split(' ')
+        else:
+            items = self._split_nested_list(clean_content)
         
         # Фильтруем только простые идентификаторы
         result = []
         for item in items:
+            item = item.strip()
+            if not item:
+                continue
             # Простой идентификатор или вызов (namespace.event)
-            if re.match(r'^[a-zA-Z0-9_][a-zA-Z0-9_\.:]*$', item):
+            # (strip по набору символов убирает всё, если других символов нет)
+            if item[0] in _IDENT_START and not item.strip(_IDENT_CHARS):
                 result.append(item)
         
         return result
     
+    def _split_nested_list(self, content: str) -> List[str]:
+        """
+        Разбивает список по пробелам вне вложенных блоков.
+        Регулярка ищет только скобки; куски между ними на нулевой глубине
+        режутся через split, внутри блоков - берутся целиком.
+        """
+        items = []
+        depth = 0
+        current = ""
+        pos = 0
+        
+        # None в конце - хвост после последней скобки
+        for match in chain(_BRACE_RE.finditer(content), [None]):
+            segment = content[pos:match.start()] if match else content[pos:]
+            
+            if depth == 0:
+                parts = segment.replace('\t', ' ').split(' ')
+                current += parts[0]
+                for part in parts[1:]:
+                    if current.strip():
+                        # Проверяем что это не свойство (name = value)
+                        if '=' not in current or '{' in current:
+                            items.append(current)
+                        current = part
+                    else:
+                        current += part
+            else:
+                current += segment
+            
+            if match is None:
+                break
+            brace = match.group()
+            current += brace
+            depth += 1 if brace == '{' else -1
+            pos = match.end()
+        
+        if current.strip() and ('=' not in current or '{' in current):
+            items.append(current)
+        
+        return items
+    
     def _blocks_differ(self, base: ParsedBlock, mod: ParsedBlock) -> bool:
         """Проверяет отличаются ли блоки"""
-        # Нормализуем и сравниваем
-        base_norm = self._normalize_content(base.inner_text)
-        mod_norm = self._normalize_content(mod.inner_text)
-        return base_norm != mod_norm
-    
-    def _normalize_content(self, content: str) -> str:
-        """Нормализует содержимое для сравнения"""
-        # Убираем комментарии
-        lines = []
-        for line in content.split('\n'):
-            if '#' in line:
-                hash_pos = self._find_comment_start(line)
-                if hash_pos >= 0:
-                    line = line[:hash_pos]
-            line = line.strip()
-            if line:
-                lines.append(line)
-        
-        return ' '.join(lines)
+        # Одинаковый исходный текст - частый случай, нормализация не нужна
+        if base.inner_text == mod.inner_text:
+            return False
+        # Сравниваем нормализованное содержимое (кэшируется в блоке)
+        return base.normalized != mod.normalized
     
     def _deep_merge_block(self, base_block: ParsedBlock, mod_blocks: List[Tuple[str, ParsedBlock]], depth: int = 0) -> str:
         """
         Глубокий мерж блока с учётом правил Paradox.
-        РЕКУРСИВНО проверяет каждый уровень вложенности.
+        Проверяет КАЖДЫЙ уровень вложенности.
         
         Поддерживает множественные блоки с одинаковым именем (if, if, if).
         Сопоставление по ИНДЕКСУ: base.if[0] ↔ mod.if[0], base.if[1] ↔ mod.if[1]
@@ -521,17 +807,127 @@ class StructuralMerger:
         Стратегии:
         - ACCUMULATE_LIST: накапливаем элементы (on_actions, events)
         - REPLACE_WHOLE: берём целиком из мода с наивысшим приоритетом
-        - RECURSIVE: мержим рекурсивно (контейнеры) - вызываем себя для детей
+        - RECURSIVE: мержим рекурсивно (контейнеры) - спускаемся в детей
+        
+        Вложенные контейнеры обходятся через явный стек (без рекурсии).
+        Все правки собираются списком (начало, конец, новый текст) по смещениям
+        базового текста и применяются к блоку за один проход в конце.
         
         Args:
             base_block: Базовый блок
             mod_blocks: Список (mod_name, block) из модов
-            depth: Глубина рекурсии (для отладки)
+            depth: Глубина вложенности (для отладки)
         """
-        from .paradox_rules import is_gui_background_container
+        whole_text = self._merge_whole_block(base_block, mod_blocks, depth)
+        if whole_text is not None:
+            return whole_text
         
-        result_text = base_block.full_text
+        edits: List[Tuple[int, int, str]] = []
+        
+        # Стек вместо рекурсии: (блок, версии из модов, итератор по детям, глубина)
+        stack = [(base_block, mod_blocks, self._iter_children(base_block), depth)]
         
+        while stack:
+            block, block_mods, children, block_depth = stack[-1]
+            entry = next(children, None)
+            
+            if entry is None:
+                # Все дети блока обработаны - добавляем НОВЫЕ блоки из модов
+                stack.pop()
+                self._add_new_children(block, block_mods, edits)
+                continue
+            
+            child_name, idx, base_child = entry
+            child_strategy = get_merge_strategy(child_name, block.name)
+            
+            if child_strategy == MergeStrategy.ACCUMULATE_LIST:
+                # === ACCUMULATE: накапливаем элементы списка ===
+                if base_child.list_items:
+                    all_items = list(base_child.list_items)
+                    seen_items = set(all_items)  # O(1) проверка вместо поиска по списку
+                    
+                    for mod_name, mod_block in block_mods:
+                        mod_children = mod_block.get_all_children(child_name)
+                        if idx < len(mod_children):
+                            mod_child = mod_children[idx]
+                            for item in mod_child.list_items:
+                                if item not in seen_items:
+                                    seen_items.add(item)
+                                    all_items.append(item)
+                                    self.changes.append(MergeChange(
+                                        path=f"{block.name}.{child_name}[{idx}]",
+                                        change_type='added_list_item',
+                                        mod_name=mod_name,
+                                        content=item
+                                    ))
+                    
+                    # Если есть новые элементы - обновляем
+                    if len(all_items) > len(base_child.list_items):
+                        edits.append((
+                            base_child.start_offset,
+                            base_child.end_offset,
+                            self._update_list_in_text(
+                                base_child.full_text,
+                                child_name,
+                                base_child.list_items,
+                                all_items,
+                                base_child.full_text
+                            )
+                        ))
+            
+            elif child_strategy == MergeStrategy.RECURSIVE:
+                # === RECURSIVE: спускаемся во вложенный контейнер ===
+                # Собираем версии этого child[idx] из всех модов
+                child_mod_blocks = []
+                for mod_name, mod_block in block_mods:
+                    mod_children = mod_block.get_all_children(child_name)
+                    if idx < len(mod_children):
+                        child_mod_blocks.append((mod_name, mod_children[idx]))
+                
+                if child_mod_blocks:
+                    child_text = self._merge_whole_block(base_child, child_mod_blocks, block_depth + 1)
+                    if child_text is not None:
+                        edits.append((base_child.start_offset, base_child.end_offset, child_text))
+                    else:
+                        stack.append((
+                            base_child,
+                            child_mod_blocks,
+                            self._iter_children(base_child),
+                            block_depth + 1
+                        ))
+            
+            elif child_strategy == MergeStrategy.REPLACE_WHOLE:
+                # === REPLACE: берём целиком из последнего мода который изменил этот индекс ===
+                for mod_name, mod_block in reversed(block_mods):
+                    mod_children = mod_block.get_all_children(child_name)
+                    if idx < len(mod_children):
+                        mod_child = mod_children[idx]
+                        # Проверяем что реально изменён
+                        if self._blocks_differ(base_child, mod_child):
+                            edits.append((base_child.start_offset, base_child.end_offset, mod_child.full_text))
+                            self.changes.append(MergeChange(
+                                path=f"{block.name}.{child_name}[{idx}]",
+                                change_type='replaced_block',
+                                mod_name=mod_name,
+                                content=child_name
+                            ))
+                            break  # Берём только из последнего мода
+        
+        return self._apply_edits(base_block, edits)
+    
+    def _iter_children(self, block: ParsedBlock):
+        """Перебирает детей блока: (child_name, index, child)"""
+        for child_name, children_list in block.children.items():
+            for idx, child in enumerate(children_list):
+                yield child_name, idx, child
+    
+    def _merge_whole_block(self, base_block: ParsedBlock, mod_blocks: List[Tuple[str, ParsedBlock]], depth: int) -> Optional[str]:
+        """
+        Мерж блоков, которые собираются целиком, а не правками по детям.
+        
+        Returns:
+            Итоговый текст блока или None, если блок нужно мержить по детям
+        """
         # Определяем стратегию для родительского блока
         parent_strategy = get_merge_strategy(base_block.name)
         
@@ -546,142 +942,87 @@ class StructuralMerger:
                     content=base_block.name
                 ))
                 return last_mod_block.full_text
-            return result_text
+            return base_block.full_text
         
         # Специальная обработка для GUI контейнеров
         # texture и environment сравниваются по содержимому, не по индексу
         if is_gui_background_container(base_block.name):
             return self._merge_gui_container(base_block, mod_blocks, depth)
         
-        # RECURSIVE или ACCUMULATE - обрабатываем children
-        # Теперь children это Dict[str, List[ParsedBlock]]
-        for child_name, base_children_list in base_block.children.items():
-            child_strategy = get_merge_strategy(child_name, base_block.name)
+        return None
+    
+    def _add_new_children(self, base_block: ParsedBlock, mod_blocks: List[Tuple[str, ParsedBlock]],
+                          edits: List[Tuple[int, int, str]]):
+        """
+        Добавляет НОВЫЕ блоки из модов перед закрывающей скобкой блока
+        1. Новые блоки с уникальными именами
+        2. Дополнительные блоки с существующими именами (if[2] когда в базе только if[0], if[1])
+        """
+        added_blocks = set()  # (child_name, index) - отслеживаем что уже добавили
+        new_children_text: List[str] = []  # вставляются одной правкой в конце
+        
+        # Позиция закрывающей скобки блока в базовом тексте
+        close_brace_pos = base_block.full_text.rfind('}')
+        
+        for (child_name, idx), mod_child, mod_name in self._iter_new_children(base_block, mod_blocks):
+            key = (child_name, idx)
+            if key in added_blocks:
+                continue
             
-            # Обрабатываем КАЖДЫЙ блок с данным именем по индексу
-            for idx, base_child in enumerate(base_children_list):
-                
-                if child_strategy == MergeStrategy.ACCUMULATE_LIST:
-                    # === ACCUMULATE: накапливаем элементы списка ===
-                    if base_child.list_items:
-                        all_items = list(base_child.list_items)
-                        
-                        for mod_name, mod_block in mod_blocks:
-                            mod_children = mod_block.get_all_children(child_name)
-                            if idx < len(mod_children):
-                                mod_child = mod_children[idx]
-                                for item in mod_child.list_items:
-                                    if item not in all_items:
-                                        all_items.append(item)
-                                        self.changes.append(MergeChange(
-                                            path=f"{base_block.name}.{child_name}[{idx}]",
-                                            change_type='added_list_item',
-                                            mod_name=mod_name,
-                                            content=item
-                                        ))
-                        
-                        # Если есть новые элементы - обновляем
-                        if len(all_items) > len(base_child.list_items):
-                            result_text = self._update_list_in_text(
-                                result_text, 
-                                child_name, 
-                                base_child.list_items,
-                                all_items,
-                                base_child.full_text
-                            )
-                
-                elif child_strategy == MergeStrategy.RECURSIVE:
-                    # === RECURSIVE: рекурсивно мержим вложенный контейнер ===
-                    # Собираем версии этого child[idx] из всех модов
-                    child_mod_blocks = []
-                    for mod_name, mod_block in mod_blocks:
-                        mod_children = mod_block.get_all_children(child_name)
-                        if idx < len(mod_children):
-                            child_mod_blocks.append((mod_name, mod_children[idx]))
+            if is_safe_to_add_child(child_name, base_block.name):
+                if close_brace_pos > 0:
+                    indent = base_block.indent + '\t'
+                    new_children_text.append('\n' + indent + mod_child.full_text.strip() + '\n')
+                    added_blocks.add(key)
                     
-                    if child_mod_blocks:
-                        # Рекурсивный вызов для вложенного блока
-                        merged_child_text = self._deep_merge_block(base_child, child_mod_blocks, depth + 1)
-                        result_text = result_text.replace(base_child.full_text, merged_child_text, 1)
-                
-                elif child_strategy == MergeStrategy.REPLACE_WHOLE:
-                    # === REPLACE: берём целиком из последнего мода который изменил этот индекс ===
-                    for mod_name, mod_block in reversed(mod_blocks):
-                        mod_children = mod_block.get_all_children(child_name)
-                        if idx < len(mod_children):
-                            mod_child = mod_children[idx]
-                            # Проверяем что реально изменён
-                            if self._blocks_differ(base_child, mod_child):
-                                result_text = result_text.replace(
-                                    base_child.full_text, 
-                                    mod_child.full_text, 
-                                    1
-                                )
-                                self.changes.append(MergeChange(
-                                    path=f"{base_block.name}.{child_name}[{idx}]",
-                                    change_type='replaced_block',
-                                    mod_name=mod_name,
-                                    content=child_name
-                                ))
-                                break  # Берём только из последнего мода
-        
-        # Добавляем НОВЫЕ блоки из модов
-        # 1. Новые блоки с уникальными именами
-        # 2. Дополнительные блоки с существующими именами (if[2] когда в базе только if[0], if[1])
-        added_blocks = set()  # (child_name, index) - отслеживаем что уже добавили
+                    self.changes.append(MergeChange(
+                        path=f"{base_block.name}.{child_name}[{idx}]",
+                        change_type='added_child_block',
+                        mod_name=mod_name,
+                        content=child_name
+                    ))
+            else:
+                self.changes.append(MergeChange(
+                    path=f"{base_block.name}.{child_name}[{idx}]",
+                    change_type='skipped_unsafe',
+                    mod_name=mod_name,
+                    content=f"Пропущен небезопасный блок {child_name}"
+                ))
         
+        if new_children_text:
+            insert_offset = base_block.start_offset + close_brace_pos
+            edits.append((insert_offset, insert_offset, ''.join(new_children_text)))
+    
+    def _iter_new_children(self, base_block: ParsedBlock, mod_blocks: List[Tuple[str, ParsedBlock]]):
+        """
+        Перебирает детей модов, которых нет в базе: ((child_name, index), child, mod_name).
+        Новый индекс - за пределами базы (в т.ч. тип блока, которого в базе нет вообще).
+        """
         for mod_name, mod_block in mod_blocks:
             for child_name, mod_children_list in mod_block.children.items():
-                base_children = base_block.get_all_children(child_name)
-                base_count = len(base_children)
-                
-                for idx, mod_child in enumerate(mod_children_list):
-                    if idx >= base_count:
-                        # Это НОВЫЙ блок (индекс за пределами базы)
-                        key = (child_name, idx)
-                        if key not in added_blocks:
-                            if is_safe_to_add_child(child_name, base_block.name):
-                                close_brace_pos = result_text.rfind('}')
-                                if close_brace_pos > 0:
-                                    indent = base_block.indent + '\t'
-                                    new_block_text = '\n' + indent + mod_child.full_text.strip()
-                                    result_text = result_text[:close_brace_pos] + new_block_text + '\n' + result_text[close_brace_pos:]
-                                    added_blocks.add(key)
-                                    
-                                    self.changes.append(MergeChange(
-                                        path=f"{base_block.name}.{child_name}[{idx}]",
-                                        change_type='added_child_block',
-                                        mod_name=mod_name,
-                                        content=child_name
-                                    ))
-                            else:
-                                self.changes.append(MergeChange(
-                                    path=f"{base_block.name}.{child_name}[{idx}]",
-                                    change_type='skipped_unsafe',
-                                    mod_name=mod_name,
-                                    content=f"Пропущен небезопасный блок {child_name}"
-                                ))
-                    
-                    elif base_count == 0:
-                        # Полностью новый тип блока (не было в базе вообще)
-                        key = (child_name, idx)
-                        if key not in added_blocks:
-                            if is_safe_to_add_child(child_name, base_block.name):
-                                close_brace_pos = result_text.rfind('}')
-                                if close_brace_pos > 0:
-                                    indent = base_block.indent + '\t'
-                                    new_block_text = '\n' + indent + mod_child.full_text.strip()
-                                    result_text = result_text[:close_brace_pos] + new_block_text + '\n' + result_text[close_brace_pos:]
-                                    added_blocks.add(key)
-                                    
-                                    self.changes.append(MergeChange(
-                                        path=f"{base_block.name}.{child_name}[{idx}]",
-                                        change_type='added_new_child',
-                                        mod_name=mod_name,
-                                        content=child_name
-                                    ))
+                base_count = base_block.child_count(child_name)
+                for idx in range(base_count, len(mod_children_list)):
+                    yield (child_name, idx), mod_children_list[idx], mod_name
+    
+    def _apply_edits(self, block: ParsedBlock, edits: List[Tuple[int, int, str]]) -> str:
+        """
+        Применяет правки (начало, конец, новый текст) к тексту блока за один проход.
+        Смещения - в исходном тексте, из которого разобран блок.
+        Вставки в одну позицию идут в порядке добавления.
+        """
+        if not edits:
+            return block.full_text
         
-        return result_text
+        text = block.full_text
+        base_offset = block.start_offset
+        parts = []
+        pos = 0
+        for start, end, new_text in sorted(edits, key=lambda edit: (edit[0], edit[1])):
+            parts.append(text[pos:start - base_offset])
+            parts.append(new_text)
+            pos = end - base_offset
+        parts.append(text[pos:])
+        return ''.join(parts)
     
     def _merge_gui_container(self, base_block: ParsedBlock, mod_blocks: List[Tuple[str, ParsedBlock]], depth: int = 0) -> str:
         """
@@ -691,95 +1032,95 @@ class StructuralMerger:
         а не по индексу. Это позволяет:
         - Накапливать уникальные блоки из разных модов
         - Заменять блоки с одинаковым trigger на версию из последнего мода
+        
+        Совпадение только точное (после нормализации), без поиска «почти
+        дубликатов»: блоки, отличающиеся одним значением (другая текстура,
+        другой trigger), - это разные фоны, и оба должны остаться.
         """
         result_text = base_block.full_text
         
         # Собираем все уникальные блоки
-        # Ключ = нормализованное содержимое (для сравнения)
+        # Ключ = отпечаток нормализованного содержимого (для сравнения),
+        # сам нормализованный текст не храним
         # Значение = (mod_name, full_text)
         
         # Начинаем с базовых блоков
-        all_blocks = {}  # normalized_content -> (source, full_text)
+        all_blocks = {}  # fingerprint -> (source, full_text)
         
         for child_name, base_children in base_block.children.items():
             for base_child in base_children:
-                normalized = self._normalize_block_content(base_child.inner_text)
-                all_blocks[normalized] = ('base', base_child.full_text)
+                key = self._block_fingerprint(base_child)
+                all_blocks[key] = ('base', base_child.full_text)
         
         # Добавляем/заменяем из модов
         for mod_name, mod_block in mod_blocks:
             for child_name, mod_children in mod_block.children.items():
                 for mod_child in mod_children:
-                    normalized = self._normalize_block_content(mod_child.inner_text)
+                    key = self._block_fingerprint(mod_child)
                     
-                    if normalized in all_blocks:
-                        # Блок уже есть - заменяем если из мода (последний побеждает)
-                        old_source, _ = all_blocks[normalized]
-                        all_blocks[normalized] = (mod_name, mod_child.full_text)
-                    else:
+                    if key not in all_blocks:
                         # Новый уникальный блок - добавляем
-                        all_blocks[normalized] = (mod_name, mod_child.full_text)
                         self.changes.append(MergeChange(
                             path=f"{base_block.name}.{child_name}",
                             change_type='added_gui_block',
                             mod_name=mod_name,
                             content=mod_child.full_text[:50]
                         ))
+                    
+                    # Новый встаёт в конец, уже бывший заменяется на месте (последний мод побеждает)
+                    all_blocks[key] = (mod_name, mod_child.full_text)
         
         # Собираем результат
         # Берём header блока и добавляем все уникальные блоки
         
-        # Находим начало блока (до первого child)
-        block_start = base_block.full_text.find('{') + 1
+        # Начало блока (до первого child) известно из разбора
+        block_start = base_block.header_end
         
         # Собираем все блоки
+        # Нормализуем отступы: обрезаем пробелы по краям каждой строки,
+        # затем ставим отступ перед непустыми строками
         indent = base_block.indent + '\t'
-        all_block_texts = []
-        for normalized, (source, full_text) in all_blocks.items():
-            # Нормализуем отступы
-            lines = full_text.strip().split('\n')
-            normalized_lines = []
-            for line in lines:
-                stripped = line.strip()
-                if stripped:
-                    normalized_lines.append(indent + stripped)
-                else:
-                    normalized_lines.append('')
-            all_block_texts.append('\n'.join(normalized_lines))
+        all_block_texts = [
+            _NONEMPTY_LINE_RE.sub(indent, _LINE_EDGE_WS_RE.sub('', full_text.strip()))
+            for source, full_text in all_blocks.values()
+        ]
         
-        # Формируем результат
+        # Формируем результат одним join
         header = base_block.full_text[:block_start]
-        result = header + '\n' + '\n'.join(all_block_texts) + '\n' + base_block.indent + '}'
-        
-        return result
+        return ''.join((
+            header, '\n', '\n'.join(all_block_texts), '\n', base_block.indent, '}'
+        ))
+    
+    def _block_fingerprint(self, block: ParsedBlock) -> bytes:
+        """
+        128-битный отпечаток нормализованного содержимого блока (ключ для дедупликации).
+        Считается один раз и хранится в блоке: блоки базы из кэша разбора
+        участвуют в каждом мерже файла.
+        """
+        if block._fingerprint is None:
+            normalized = self._normalize_block_content(block.inner_text)
+            block._fingerprint = hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+        return block._fingerprint
     
     def _normalize_block_content(self, content: str) -> str:
         """
         Нормализует содержимое блока для сравнения.
         Убирает пробелы, переносы строк, комментарии.
         """
-        # Убираем комментарии
-        lines = []
-        for line in content.split('\n'):
-            if '#' in line:
-                line = line[:line.index('#')]
-            line = line.strip()
-            if line:
-                lines.append(line)
+        # Убираем комментарии (до конца строки) одной заменой;
+        # в большинстве блоков комментариев нет - тогда только split
+        if '#' in content:
+            content = _COMMENT_TAIL_RE.sub('', content)
         
-        # Соединяем и нормализуем пробелы
-        normalized = ' '.join(lines)
-        # Убираем множественные пробелы
-        normalized = ' '.join(normalized.split())
-        return normalized
+        # Схлопываем все пробелы и переносы за один split
+        return ' '.join(content.split())
     
     def _update_list_in_text(self, text: str, list_name: str, old_items: List[str], 
                              new_items: List[str], old_block_text: str) -> str:
         """Обновляет список в тексте, добавляя новые элементы"""
         
         # Ищем начало блока
-        start_pattern = rf'{re.escape(list_name)}\s*=\s*\{{'
-        start_match = re.search(start_pattern, text)
+        start_match = _list_start_re(list_name).search(text)
         
         if not start_match:
             return text
@@ -787,32 +1128,36 @@ class StructuralMerger:
         start_pos = start_match.start()
         brace_start = start_match.end() - 1  # позиция {
         
-        # Находим соответствующую закрывающую скобку
+        # Находим соответствующую закрывающую скобку,
+        # перескакивая между скобками через find
         depth = 0
         end_pos = brace_start
+        pos = brace_start
         
-        for i in range(brace_start, len(text)):
-            char = text[i]
-            if char == '{':
+        while True:
+            close_pos = text.find('}', pos)
+            if close_pos < 0:
+                break
+            open_pos = text.find('{', pos, close_pos)
+            if open_pos >= 0:
                 depth += 1
-            elif char == '}':
+                pos = open_pos + 1
+            else:
                 depth -= 1
                 if depth == 0:
-                    end_pos = i + 1
+                    end_pos = close_pos + 1
                     break
+                pos = close_pos + 1
         
         old_block = text[start_pos:end_pos]
         inner = text[brace_start + 1:end_pos - 1]
         
         # Определяем формат
         if '\n' in inner:
-            # Многострочный - находим отступ
-            indent = '\t\t'
-            for line in inner.split('\n'):
-                stripped = line.strip()
-                if stripped and not stripped.startswith('#'):
-                    indent = line[:len(line) - len(line.lstrip())]
-                    break
+            # Многострочный - находим отступ первой строки с элементом
+            # (не пустой и не комментария)
+            indent_match = _ITEM_INDENT_RE.search(inner)
+            indent = indent_match.group(1) if indent_match else '\t\t'
             
             # Формируем новое содержимое
             new_lines = []
@@ -839,33 +1184,55 @@ class StructuralMerger:
             new_inner = ' ' + ' '.join(new_items) + ' '
         
         new_block = f'{list_name} = {{{new_inner}}}'
-        return text[:start_pos] + new_block + text[end_pos:]
-    
-    def _find_comment_start(self, line: str) -> int:
-        """Находит начало комментария (# вне кавычек)"""
-        in_quotes = False
-        for i, char in enumerate(line):
-            if char == '"' and (i == 0 or line[i-1] != '\\'):
-                in_quotes = not in_quotes
-            elif char == '#' and not in_quotes:
-                return i
-        return -1
-    
-    def _validate_braces(self, content: str) -> bool:
-        """Проверяет баланс скобок"""
-        open_count, close_count = self._count_braces(content)
-        return open_count == close_count
+        return ''.join((text[:start_pos], new_block, text[end_pos:]))
+    
+    def _replace_counted(self, content: str, old: str, new: str) -> Tuple[str, int, int]:
+        """
+        Заменяет первое вхождение old на new.
+        
+        Returns:
+            (новый текст, изменение числа '{', изменение числа '}')
+        """
+        pos = content.find(old)
+        if pos < 0:
+            return content, 0, 0
+        old_open, old_close = self._count_braces(old)
+        new_open, new_close = self._count_braces(new)
+        return (
+            content[:pos] + new + content[pos + len(old):],
+            new_open - old_open,
+            new_close - old_close
+        )
     
     def _count_braces(self, content: str) -> Tuple[int, int]:
         """Считает скобки без комментариев"""
-        open_count = 0
-        close_count = 0
-        
-        for line in content.split('\n'):
-            hash_pos = self._find_comment_start(line)
-            if hash_pos >= 0:
-                line = line[:hash_pos]
-            open_count += line.count('{')
-            close_count += line.count('}')
-        
-        return open_count, close_count
+        if '#' in content:
+            # Комментарии вырезаются одной заменой, строки в кавычках остаются
+            content = _QUOTED_OR_COMMENT_RE.sub(r'\1', content)
+        return content.count('{'), content.count('}')
+
+
+@lru_cache(maxsize=256)
+def _list_start_re(list_name: str) -> re.Pattern:
+    """Скомпилированная регулярка начала списка: list_name = {"""
+    return re.compile(rf'{re.escape(list_name)}\s*=\s*\{{')
+
+
+@lru_cache(maxsize=32)
+def _parse_base_file(path: str, mtime_ns: int, size: int) -> Tuple[str, Dict[str, ParsedBlock], Tuple[int, int]]:
+    """
+    Читает и парсит базовый файл.
+    
+    Кэш по (путь, mtime, размер): одни и те же файлы базы мержатся заново
+    при каждой генерации патча. mtime_ns и size нужны только как часть
+    ключа - изменённый файл разбирается заново. Блоки из кэша общие,
+    мерж их не изменяет.
+    
+    Returns:
+        (текст, блоки верхнего уровня, (число '{', число '}'))
+    """
+    merger = StructuralMerger()
+    content = merger._read_file(Path(path))
+    table = merger._tokenize(content)
+    blocks = merger._parse_top_level_blocks(content, table)
+    return content, blocks, (table.open_braces, table.close_braces)
@@ -5,9 +5,17 @@ Main Window v2 with i18n support
 
 import sys
 import os
+import time
+import re
 import json
+import codecs
+import hashlib
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Iterable, Iterator, TextIO
 
 from PyQt5.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
@@ -18,23 +26,233 @@ from PyQt5.QtWidgets import (
     QButtonGroup, QFrame, QScrollArea, QInputDialog,
     QApplication, QActionGroup, QDialog
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSettings
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal, QSettings
 from PyQt5.QtGui import QFont, QColor, QIcon
 
 try:
     from ..core.scanner import ModScanner, ModInfo, get_paradox_mods_path, get_game_install_path, get_all_mods_paths
-    from ..core.smart_merger import read_mod_name, read_mod_dependencies, validate_mod_compatibility
+    from ..core.smart_merger import read_mod_name, validate_mod_compatibility
     from ..core.smart_patch_generator import SmartPatchGenerator, PatchStats, PatchProgress
     from ..i18n import tr, i18n, LANGUAGES
     from ..version import __version__
 except ImportError:
     from core.scanner import ModScanner, ModInfo, get_paradox_mods_path, get_game_install_path, get_all_mods_paths
-    from core.smart_merger import read_mod_name, read_mod_dependencies, validate_mod_compatibility
+    from core.smart_merger import read_mod_name, validate_mod_compatibility
     from core.smart_patch_generator import SmartPatchGenerator, PatchStats, PatchProgress
     from i18n import tr, i18n, LANGUAGES
     from version import __version__
 
 
+# Комментарии и пробельные символы (включая переводы строк) - они не влияют на смысл файла
+_NORMALIZE_RE = re.compile(rb'#[^\n]*|[ \t\r\n\f\v]+')
+
+
+_HASH_CHUNK_SIZE = 1 << 16
+
+
+def _iter_line_chunks(f) -> Iterator[bytes]:
+    """Блоки файла, обрезанные по концу строки: комментарий не разрывается между блоками"""
+    tail = b''
+    while True:
+        chunk = f.read(_HASH_CHUNK_SIZE)
+        if not chunk:
+            break
+        chunk = tail + chunk
+        cut = chunk.rfind(b'\n') + 1
+        tail = chunk[cut:]
+        if cut:
+            yield chunk[:cut]
+    if tail:
+        yield tail
+
+
+def _normalized_hash(path: Path) -> bytes:
+    """Хэш содержимого файла без комментариев и пробелов.
+    
+    Файл читается блоками, в памяти нет его полной копии. Работаем с байтами:
+    для сравнения на равенство декодировать UTF-8 не нужно.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for index, chunk in enumerate(_iter_line_chunks(f)):
+            if index == 0 and chunk.startswith(codecs.BOM_UTF8):
+                chunk = chunk[len(codecs.BOM_UTF8):]
+            digest.update(_NORMALIZE_RE.sub(b'', chunk))
+    return digest.digest()
+
+
+def _raw_hash(path: Path) -> bytes:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _mod_has_changes(mod_path: Path, mod_files: Dict[str, Path], base_files: Dict[str, tuple], base_path: Path,
+                     base_hashes: Dict[str, tuple], cached: Optional[tuple]) -> tuple:
+    """Отличается ли хоть один общий с базой файл мода (не трогает Qt - можно в пуле потоков).
+    
+    Возвращает (ключ, has_changes). Ключ - хэш путей, размеров и mtime всех сравниваемых
+    файлов мода и базы: если он совпал с ключом прошлой проверки cached, файлы не читаются.
+    base_hashes - общий для всех модов кэш хэшей файлов базы: каждый файл базы
+    читается один раз, сколько бы модов его ни переопределяли.
+    """
+    common_files = sorted(base_files.keys() & mod_files.keys())
+    
+    key_hash = hashlib.blake2b(digest_size=16)
+    mod_stats = []
+    for mod_file in common_files:
+        try:
+            stat = (mod_path / mod_file).stat()
+            mod_stat = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            mod_stat = None
+        mod_stats.append(mod_stat)
+        key_hash.update(f"{mod_file}|{mod_stat}|{base_files[mod_file]}\n".encode('utf-8', 'surrogatepass'))
+    key = key_hash.hexdigest()
+    
+    if cached and cached[0] == key:
+        return key, cached[1]
+    
+    for mod_file, mod_stat in zip(common_files, mod_stats):
+        if mod_stat is None:
+            continue
+        base_stat = base_files[mod_file]
+        base_file = base_path / mod_file
+        try:
+            base_entry = base_hashes.get(mod_file)
+            if base_entry is None or base_entry[0] != base_stat:
+                # Гонка между потоками пула безвредна: хэш просто посчитается дважды
+                base_entry = base_hashes[mod_file] = (base_stat, _raw_hash(base_file), _normalized_hash(base_file))
+            _base_stat, base_raw_hash, base_hash = base_entry
+            # Побайтовая копия файла базы - частый случай, нормализация не нужна;
+            # сырой хэш считаем только при совпадении размера
+            if mod_stat[0] == base_stat[0] and _raw_hash(mod_path / mod_file) == base_raw_hash:
+                continue
+            if _normalized_hash(mod_path / mod_file) != base_hash:
+                return key, True
+        except Exception:
+            return key, True
+    return key, False
+
+
+_MERGEABLE_FOLDERS = ('common', 'events', 'history', 'decisions', 'gui', 'interface', 'gfx',
+                      'scripted_triggers', 'scripted_effects', 'on_actions')
+
+
+def _collect_base_files(base_path: Path) -> Dict[str, tuple]:
+    """Файлы базы: относительный путь (через os.sep, как ключи ModInfo.files) -> (размер, mtime)"""
+    files = {}
+    
+    for folder in _MERGEABLE_FOLDERS:
+        folder_path = base_path / folder
+        if folder_path.exists():
+            # Обход через scandir: тип и stat записи берутся из DirEntry (в Windows без
+            # лишних обращений к диску), относительный путь склеиваем строкой
+            stack = [(str(folder_path), folder)]
+            while stack:
+                dir_path, relative = stack.pop()
+                try:
+                    with os.scandir(dir_path) as entries:
+                        for entry in entries:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append((entry.path, relative + os.sep + entry.name))
+                            elif entry.name.endswith(('.txt', '.gui', '.gfx')):
+                                try:
+                                    stat = entry.stat()
+                                except OSError:
+                                    continue
+                                files[relative + os.sep + entry.name] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+    return files
+
+
+def _write_text_atomic(path: Path, text: str):
+    """Пишет текст во временный файл и подменяет им path: при сбое старый файл останется целым"""
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        # Кодируем сразу целиком и пишем одним вызовом, без буфера текстового режима
+        tmp_path.write_bytes(text.encode('utf-8'))
+        os.replace(tmp_path, path)
+    except Exception:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def _write_json_atomic(path: Path, data, indent: Optional[int] = None):
+    _write_text_atomic(path, json.dumps(data, ensure_ascii=False, indent=indent))
+
+
+_MD_HEADING_RE = re.compile(r'(#{1,3}) (.+)$')
+_MD_BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+_MD_ITALIC_RE = re.compile(r'\*(.+?)\*')
+_MD_CODE_RE = re.compile(r'`(.+?)`')
+_MD_LINK_RE = re.compile(r'\[(.+?)\]\((.+?)\)')
+
+
+def _md_inline(text: str) -> str:
+    """Жирный, курсив, код и ссылки внутри одной строки markdown"""
+    # Регулярки запускаем, только если в строке есть их маркер
+    if '*' in text:
+        text = _MD_BOLD_RE.sub(r'<strong>\1</strong>', text)
+        text = _MD_ITALIC_RE.sub(r'<em>\1</em>', text)
+    if '`' in text:
+        text = _MD_CODE_RE.sub(r'<code>\1</code>', text)
+    if '](' in text:
+        text = _MD_LINK_RE.sub(r'<a href="\2">\1</a>', text)
+    return text
+
+
+_LOG_COLORS = {"info": "#000000", "success": "#4CAF50", "warning": "#FF9800", "error": "#f44336"}
+
+
+_DOC_HTML_HEAD = '''<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>Paradox Mod Patcher - Documentation</title>
+    <style>
+        body { font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif; 
+               max-width: 900px; margin: 40px auto; padding: 20px; line-height: 1.6; }
+        h1, h2, h3 { color: #333; }
+        code { background: #f4f4f4; padding: 2px 6px; border-radius: 3px; }
+        pre { background: #f4f4f4; padding: 15px; border-radius: 5px; overflow-x: auto; }
+        table { border-collapse: collapse; margin: 15px 0; }
+        td, th { padding: 8px 12px; border: 1px solid #ddd; }
+        a { color: #0066cc; }
+        hr { border: none; border-top: 1px solid #ddd; margin: 30px 0; }
+        li { margin: 5px 0; }
+    </style>
+</head>
+<body>
+'''
+_DOC_HTML_TAIL = '''</body>
+</html>'''
+
+
+@lru_cache(maxsize=8)
+def _resolve_doc_path(lang: str) -> Optional[Path]:
+    """Файл документации на языке lang (или английский), ищется один раз на язык"""
+    docs_dirs = [
+        # При запуске из исходников
+        os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "resources", "docs"),
+        # При запуске из exe (PyInstaller)
+        os.path.join(os.path.dirname(sys.executable), "resources", "docs"),
+    ]
+    if hasattr(sys, '_MEIPASS'):
+        # Альтернативный путь для PyInstaller
+        docs_dirs.append(os.path.join(sys._MEIPASS, "resources", "docs"))
+    
+    for docs_dir in docs_dirs:
+        for filename in (f"README_{lang}.md", "README_en.md"):
+            candidate = os.path.join(docs_dir, filename)
+            if os.path.isfile(candidate):
+                return Path(candidate)
+    return None
+
+
 class ScanThread(QThread):
     finished = pyqtSignal(list)
     progress = pyqtSignal(str)
@@ -45,20 +263,87 @@ class ScanThread(QThread):
         
     def run(self):
         self.progress.emit(tr("scanning"))
-        all_mods = []
-        seen_paths = set()
+        # path -> ModInfo: дубликаты по пути отбрасываем, порядок первого появления сохраняется
+        all_mods = {}
         
         for mods_path in self.mods_paths:
             if mods_path.exists():
                 scanner = ModScanner(mods_path)
                 result = scanner.scan_all()
                 for mod in result.mods:
-                    # Избегаем дубликатов по пути
-                    if str(mod.path) not in seen_paths:
-                        all_mods.append(mod)
-                        seen_paths.add(str(mod.path))
+                    all_mods.setdefault(mod.path, mod)
         
-        self.finished.emit(all_mods)
+        self.finished.emit(list(all_mods.values()))
+
+
+class ChangesThread(QThread):
+    """Сравнение модов с базой вне потока UI: какие моды реально что-то меняют"""
+    # base_path_str, есть ли в базе файлы для слияния, {str(mod.path): (ключ, has_changes)}
+    finished = pyqtSignal(str, bool, dict)
+    progress = pyqtSignal(str)
+    
+    def __init__(self, mods: List[ModInfo], base_path: Path, cached: Dict[str, Optional[tuple]],
+                 base_hashes: Dict[str, tuple], scan_generation: int, executor: ThreadPoolExecutor):
+        super().__init__()
+        self.mods = mods
+        self.base_path = base_path
+        self.cached = cached
+        self.base_hashes = base_hashes
+        # Номер сканирования, для модов которого запущена проверка
+        self.scan_generation = scan_generation
+        self.executor = executor
+    
+    def run(self):
+        self.progress.emit(tr("analyzing_base"))
+        base_files = _collect_base_files(self.base_path)
+        
+        changes = {}
+        if base_files and self.mods:
+            results = self.executor.map(
+                _mod_has_changes,
+                [Path(mod.path) for mod in self.mods],
+                [mod.files for mod in self.mods],
+                repeat(base_files),
+                repeat(self.base_path),
+                repeat(self.base_hashes),
+                [self.cached.get(str(mod.path)) for mod in self.mods]
+            )
+            last_progress = time.monotonic()
+            for checked, (mod, result) in enumerate(zip(self.mods, results), 1):
+                changes[str(mod.path)] = result
+                # Статус обновляем не чаще 10 раз в секунду: каждый сигнал - перерисовка в потоке UI
+                now = time.monotonic()
+                if now - last_progress >= 0.1:
+                    self.progress.emit(tr("checking_mods", checked))
+                    last_progress = now
+        
+        self.finished.emit(str(self.base_path), bool(base_files), changes)
+
+
+class ProfileIOThread(QThread):
+    """Чтение или запись профиля вне потока UI (домашняя папка может быть на медленном диске)"""
+    finished = pyqtSignal(str, object, str)  # profile_path, данные (None при записи), текст ошибки
+    
+    def __init__(self, profile_path: Path, profile_data: Optional[dict] = None):
+        super().__init__()
+        self.profile_path = profile_path
+        self.profile_data = profile_data
+        # Аргументы finished - чтобы применить результат и без цикла событий (при закрытии окна)
+        self.result: Optional[tuple] = None
+    
+    def run(self):
+        try:
+            if self.profile_data is None:
+                with open(self.profile_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            else:
+                _write_json_atomic(self.profile_path, self.profile_data, indent=2)
+                data = None
+        except Exception as e:
+            self.result = (str(self.profile_path), None, str(e))
+        else:
+            self.result = (str(self.profile_path), data, "")
+        self.finished.emit(*self.result)
 
 
 class PatchThread(QThread):
@@ -100,17 +385,42 @@ class MainWindow(QMainWindow):
         self.setWindowTitle(f"{tr('window_title')} v{__version__}")
         self.setMinimumSize(900, 700)
         
+        self._profiles_dir: Optional[Path] = None
+        self._recent_exists_cache: Dict[str, tuple] = {}  # путь -> (time.monotonic(), существует ли)
         self.all_mods: List[ModInfo] = []
+        # all_mods по имени - сортируем один раз после сканирования, а не при каждом обновлении списка
+        self._sorted_mods: List[ModInfo] = []
+        # Поиск по имени для загрузки профиля (первый мод с таким именем)
+        self._mod_by_name: Dict[str, ModInfo] = {}
+        self._base_mod_by_name: Dict[str, int] = {}  # имя -> индекс в base_mod_data
+        # Пути модов в selected_list - меняем вместе со списком, чтобы не перебирать его виджет
+        self._selected_paths: set = set()
+        # Моды selected_list в его порядке - чтобы не читать их из виджета при генерации и сохранении
+        self._selected_mods: List[ModInfo] = []
         self.base_path: Optional[Path] = None
         self.base_is_vanilla = False
-        self._mod_changes_cache: Dict[tuple, bool] = {}
-        self._base_files_cache: Dict[str, set] = {}
+        # (str(mod.path), base_path_str) -> (ключ сравниваемых файлов, has_changes), хранится между запусками
+        self._mod_changes_cache: Dict[tuple, tuple] = {}
+        # base_path_str -> {относительный путь: ((размер, mtime), хэши файла)}, только в памяти
+        self._base_hashes_cache: Dict[str, dict] = {}
+        # Результаты, проверенные после последнего сканирования: base_path_str -> пути модов
+        # и base_path_str -> есть ли в базе файлы для слияния. Повторно в рамках одного
+        # сканирования моды не проверяются - пересканирование сбрасывает оба словаря
+        self._checked_mods: Dict[str, set] = {}
+        self._base_has_files: Dict[str, bool] = {}
+        self._scan_generation = 0
+        # Пул для сравнения модов с базой (создаётся при первой проверке)
+        self._changes_executor: Optional[ThreadPoolExecutor] = None
+        self.changes_thread: Optional[ChangesThread] = None
+        self.profile_thread: Optional[ProfileIOThread] = None
+        self._on_profile_io_finished = None
+        self._refresh_pending = False
         
         self.init_ui()
-        self.init_menu()
+        self.init_menu(defer_secondary=True)
+        self._load_changes_cache()
         
         # Автозапуск сканирования всех папок при старте
-        from PyQt5.QtCore import QTimer
         QTimer.singleShot(100, self.scan_all_mods)
         
         auto_profile = self.get_profiles_dir() / "_autosave.json"
@@ -118,29 +428,56 @@ class MainWindow(QMainWindow):
             self.load_profile(str(auto_profile))
     
     def closeEvent(self, event):
+        # Цикл событий уже не доставит finished - загруженный профиль применяем сразу,
+        # иначе автосохранение записало бы состояние без него
+        self._finish_profile_io()
         self.auto_save_profile()
+        if self.changes_thread and self.changes_thread.isRunning():
+            self.changes_thread.wait()
+        if self._changes_executor:
+            self._changes_executor.shutdown(wait=False)
+        self._save_changes_cache()
         event.accept()
     
+    def _load_changes_cache(self):
+        """Загружает результаты проверки модов прошлых запусков (устаревшие отсеются по ключу)"""
+        cache_path = self.get_profiles_dir() / "_cache.json"
+        if not cache_path.exists():
+            return
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for mod_path_str, base_path_str, key, has_changes in data.get("mod_checks", []):
+                self._mod_changes_cache[(mod_path_str, base_path_str)] = (key, has_changes)
+        except Exception:
+            # Битый кэш не страшен - просто проверим моды заново
+            self._mod_changes_cache.clear()
+    
+    def _save_changes_cache(self):
+        data = {
+            "mod_checks": [
+                [mod_path_str, base_path_str, key, has_changes]
+                for (mod_path_str, base_path_str), (key, has_changes) in self._mod_changes_cache.items()
+            ]
+        }
+        try:
+            _write_json_atomic(self.get_profiles_dir() / "_cache.json", data)
+        except Exception:
+            pass
+    
     def auto_save_profile(self):
         profile_data = {
             "mods_path": self.mods_path_label.text(),
             "base_is_vanilla": self.vanilla_radio.isChecked(),
             "base_mod_name": self.base_mod_label.text() if self.mod_radio.isChecked() else "",
             "vanilla_path": self.vanilla_path_label.text(),
-            "selected_mods": [],
+            "selected_mods": [mod.name for mod in self._selected_mods],
             "patch_name": self.patch_name_edit.currentText()
         }
         
-        for i in range(self.selected_list.count()):
-            item = self.selected_list.item(i)
-            mod = item.data(Qt.UserRole)
-            if mod:
-                profile_data["selected_mods"].append(mod.name)
-        
         auto_profile = self.get_profiles_dir() / "_autosave.json"
         try:
-            with open(auto_profile, 'w', encoding='utf-8') as f:
-                json.dump(profile_data, f, ensure_ascii=False, indent=2)
+            _write_json_atomic(auto_profile, profile_data, indent=2)
         except Exception:
             pass
     
@@ -343,7 +680,12 @@ class MainWindow(QMainWindow):
         layout.addLayout(bottom_layout)
         self.statusBar().showMessage(tr("ready_status"))
     
-    def init_menu(self):
+    def init_menu(self, defer_secondary: bool = False):
+        """Строит меню окна.
+        
+        При defer_secondary пункты языков и справки добавляются после первой
+        отрисовки окна: до показа окна они не нужны, а Файл с горячими клавишами - сразу.
+        """
         menubar = self.menuBar()
         
         # File menu
@@ -369,8 +711,17 @@ class MainWindow(QMainWindow):
         exit_action.triggered.connect(self.close)
         file_menu.addAction(exit_action)
         
-        # Language menu
+        # Сами меню создаём сразу, чтобы строка меню не перестраивалась после показа окна
         self.language_menu = menubar.addMenu(tr("menu_language"))
+        self.help_menu = menubar.addMenu(tr("menu_help"))
+        
+        if defer_secondary:
+            QTimer.singleShot(0, self._fill_secondary_menus)
+        else:
+            self._fill_secondary_menus()
+    
+    def _fill_secondary_menus(self):
+        # Language menu
         self.lang_action_group = QActionGroup(self)
         self.lang_action_group.setExclusive(True)
         
@@ -385,18 +736,16 @@ class MainWindow(QMainWindow):
             self.language_menu.addAction(action)
         
         # Help menu
-        help_menu = menubar.addMenu(tr("menu_help"))
-        
         doc_action = QAction(tr("menu_documentation"), self)
         doc_action.setShortcut("F1")
         doc_action.triggered.connect(self.show_documentation)
-        help_menu.addAction(doc_action)
+        self.help_menu.addAction(doc_action)
         
-        help_menu.addSeparator()
+        self.help_menu.addSeparator()
         
         about_action = QAction(tr("menu_about"), self)
         about_action.triggered.connect(self.show_about)
-        help_menu.addAction(about_action)
+        self.help_menu.addAction(about_action)
     
     def change_language(self, lang_code: str):
         if lang_code == i18n.current_language:
@@ -443,10 +792,21 @@ class MainWindow(QMainWindow):
         self.init_menu()
     
     def log(self, message: str, level: str = "info"):
-        colors = {"info": "#000000", "success": "#4CAF50", "warning": "#FF9800", "error": "#f44336"}
-        color = colors.get(level, "#000000")
+        color = _LOG_COLORS.get(level, "#000000")
         self.log_text.append(f'<span style="color: {color}">{message}</span>')
     
+    def log_many(self, messages: List[str], level: str = "info"):
+        """Несколько сообщений одного уровня: каждое отдельным блоком, как у log, но одна перерисовка лога"""
+        if not messages:
+            return
+        color = _LOG_COLORS.get(level, "#000000")
+        self.log_text.setUpdatesEnabled(False)
+        try:
+            for message in messages:
+                self.log_text.append(f'<span style="color: {color}">{message}</span>')
+        finally:
+            self.log_text.setUpdatesEnabled(True)
+    
     def browse_mods_folder(self):
         """Добавить кастомную папку к сканированию"""
         path = QFileDialog.getExistingDirectory(self, tr("select_mods_folder"))
@@ -507,8 +867,7 @@ class MainWindow(QMainWindow):
             self.vanilla_path_label.setText(str(path))
             self.base_path = path
             self.update_generate_button()
-            self._mod_changes_cache.clear()
-            self.refresh_available_list()
+            self._schedule_refresh()
             self.log(f"✓ {tr('game_found')}: {path}", "success")
         else:
             QMessageBox.warning(self, tr("not_found"), tr("game_not_found"))
@@ -527,9 +886,21 @@ class MainWindow(QMainWindow):
     
     def on_scan_finished(self, mods: List[ModInfo]):
         self.all_mods = mods
+        self._sorted_mods = sorted(mods, key=lambda m: m.name.lower())
+        # Новое сканирование - моды (и их файлы) могли измениться, проверяем заново
+        self._scan_generation += 1
+        self._checked_mods.clear()
+        self._base_has_files.clear()
         
         # Обновляем данные для выбора глобального мода
-        self.base_mod_data = [(mod.name, mod.path) for mod in sorted(mods, key=lambda m: m.name.lower())]
+        self.base_mod_data = [(mod.name, mod.path) for mod in self._sorted_mods]
+        
+        self._mod_by_name = {}
+        for mod in mods:
+            self._mod_by_name.setdefault(mod.name, mod)
+        self._base_mod_by_name = {}
+        for idx, (name, _path) in enumerate(self.base_mod_data):
+            self._base_mod_by_name.setdefault(name, idx)
         self.base_mod_index = 0 if self.base_mod_data else -1
         if self.base_mod_data:
             self.base_mod_label.setText(self.base_mod_data[0][0])
@@ -537,131 +908,140 @@ class MainWindow(QMainWindow):
         else:
             self.base_mod_label.setText("")
         
-        self.refresh_available_list()
+        self._schedule_refresh()
         self.log(tr("found_mods", len(mods)), "success")
         self.statusBar().showMessage(tr("found_mods", len(mods)))
     
-    def refresh_available_list(self):
-        self.available_list.clear()
-        
-        base_path = None
+    def _current_base_path(self) -> Optional[Path]:
+        """База, выбранная в интерфейсе сейчас (глобальный мод или папка игры)"""
         if self.mod_radio.isChecked():
             if self.base_mod_index >= 0 and self.base_mod_index < len(self.base_mod_data):
-                base_path = self.base_mod_data[self.base_mod_index][1]
+                return self.base_mod_data[self.base_mod_index][1]
         elif self.vanilla_radio.isChecked():
             vanilla_text = self.vanilla_path_label.text()
             if vanilla_text and vanilla_text != tr("not_selected"):
-                base_path = Path(vanilla_text)
+                return Path(vanilla_text)
+        return None
+    
+    def _lookup_changes(self, mods: List[ModInfo], base_path_str: str) -> tuple:
+        """Ищет результаты проверки модов, сделанной после последнего сканирования.
+        
+        Возвращает (base_has_files, has_changes_by_path, unchecked): base_has_files = None,
+        если база ещё не проверялась; unchecked - моды, для которых результата пока нет.
+        """
+        base_has_files = self._base_has_files.get(base_path_str)
+        has_changes_by_path = {}
+        unchecked = []
+        if base_has_files is None:
+            unchecked = list(mods)
+        elif base_has_files:
+            checked = self._checked_mods.get(base_path_str, ())
+            for mod in mods:
+                mod_path_str = str(mod.path)
+                if mod_path_str in checked:
+                    has_changes_by_path[mod.path] = self._mod_changes_cache[(mod_path_str, base_path_str)][1]
+                else:
+                    unchecked.append(mod)
+        return base_has_files, has_changes_by_path, unchecked
+    
+    def _make_available_item(self, mod: ModInfo) -> QListWidgetItem:
+        item = QListWidgetItem(f"{mod.name} ({tr('files_count', len(mod.files))})")
+        item.setData(Qt.UserRole, mod)
+        
+        # Зависимости уже разобраны сканером из того же descriptor.mod
+        deps = mod.dependencies
+        if deps:
+            item.setToolTip(tr("depends_on", ', '.join(deps)))
+        return item
+    
+    def _schedule_refresh(self):
+        """Перестраивает список доступных после возврата в цикл событий.
+        
+        Смена базы, результат сканирования и загрузка профиля вызывают обновление
+        по нескольку раз подряд - так все вызовы сливаются в один refresh_available_list.
+        """
+        if not self._refresh_pending:
+            self._refresh_pending = True
+            QTimer.singleShot(0, self._run_scheduled_refresh)
+    
+    def _run_scheduled_refresh(self):
+        self._refresh_pending = False
+        self.refresh_available_list()
+    
+    def refresh_available_list(self):
+        self.available_list.clear()
         
-        selected_paths = set()
-        for i in range(self.selected_list.count()):
-            item = self.selected_list.item(i)
-            mod = item.data(Qt.UserRole)
-            selected_paths.add(mod.path)
+        base_path = self._current_base_path()
         
-        base_files = set()
+        mods = [
+            mod for mod in self._sorted_mods
+            if not (base_path and mod.path == base_path) and mod.path not in self._selected_paths
+        ]
+        
+        base_has_files = False
         base_path_str = str(base_path) if base_path else ""
         
         if base_path and Path(base_path).exists():
-            if base_path_str in self._base_files_cache:
-                base_files = self._base_files_cache[base_path_str]
-            else:
-                self.statusBar().showMessage(tr("analyzing_base"))
-                QApplication.processEvents()
-                base_files = self._collect_base_files(Path(base_path))
-                self._base_files_cache[base_path_str] = base_files
+            base_has_files, has_changes_by_path, unchecked = self._lookup_changes(mods, base_path_str)
+            
+            # Чтение и сравнение файлов - в отдельном потоке; список построим,
+            # когда придут результаты (on_changes_finished снова вызовет refresh)
+            if base_has_files is None or unchecked:
+                if not (self.changes_thread and self.changes_thread.isRunning()):
+                    cached = {
+                        str(mod.path): self._mod_changes_cache.get((str(mod.path), base_path_str))
+                        for mod in unchecked
+                    }
+                    self.changes_thread = ChangesThread(
+                        unchecked, Path(base_path), cached, self._base_hashes_cache.setdefault(base_path_str, {}),
+                        self._scan_generation, self._get_changes_executor()
+                    )
+                    self.changes_thread.progress.connect(self.statusBar().showMessage)
+                    self.changes_thread.finished.connect(self.on_changes_finished)
+                    self.changes_thread.start()
+                self.statusBar().showMessage(tr("checking_mods", len(unchecked)))
+                return
         
         skipped_empty = 0
-        checked = 0
         
-        for mod in sorted(self.all_mods, key=lambda m: m.name.lower()):
-            if base_path and mod.path == base_path:
-                continue
-            if mod.path in selected_paths:
-                continue
-            
-            if base_files:
-                cache_key = (str(mod.path), base_path_str)
-                
-                if cache_key in self._mod_changes_cache:
-                    has_changes = self._mod_changes_cache[cache_key]
-                else:
-                    checked += 1
-                    if checked % 5 == 0:
-                        self.statusBar().showMessage(tr("checking_mods", checked))
-                        QApplication.processEvents()
-                    
-                    has_changes = self._mod_has_changes(mod, base_files, Path(base_path))
-                    self._mod_changes_cache[cache_key] = has_changes
-                
-                if not has_changes:
+        # Перерисовываем список один раз после заполнения, а не на каждый addItem
+        self.available_list.setUpdatesEnabled(False)
+        try:
+            for mod in mods:
+                if base_has_files and not has_changes_by_path[mod.path]:
                     skipped_empty += 1
                     continue
-            
-            item = QListWidgetItem(f"{mod.name} ({tr('files_count', len(mod.files))})")
-            item.setData(Qt.UserRole, mod)
-            
-            deps = read_mod_dependencies(mod.path)
-            if deps:
-                item.setToolTip(tr("depends_on", ', '.join(deps)))
-            
-            self.available_list.addItem(item)
+                
+                self.available_list.addItem(self._make_available_item(mod))
+        finally:
+            self.available_list.setUpdatesEnabled(True)
         
         if skipped_empty > 0:
             self.log(tr("hidden_mods", skipped_empty), "info")
         
         self.statusBar().showMessage(tr("available_count", self.available_list.count()))
     
-    def _collect_base_files(self, base_path: Path) -> set:
-        files = set()
-        mergeable_folders = {'common', 'events', 'history', 'decisions', 'gui', 'interface', 'gfx',
-                           'scripted_triggers', 'scripted_effects', 'on_actions'}
-        
-        for folder in mergeable_folders:
-            folder_path = base_path / folder
-            if folder_path.exists():
-                for root, dirs, filenames in os.walk(folder_path):
-                    for filename in filenames:
-                        if filename.endswith(('.txt', '.gui', '.gfx')):
-                            filepath = Path(root) / filename
-                            relative = filepath.relative_to(base_path)
-                            files.add(str(relative))
-        return files
-    
-    def _mod_has_changes(self, mod: 'ModInfo', base_files: set, base_path: Path) -> bool:
-        mod_path = Path(mod.path)
-        mod_files_set = set(mod.files.keys())
-        common_files = mod_files_set & base_files
-        
-        if not common_files:
-            return False
-        
-        for mod_file in common_files:
-            base_file = base_path / mod_file
-            mod_file_path = mod_path / mod_file
-            
-            if base_file.exists() and mod_file_path.exists():
-                try:
-                    with open(base_file, 'r', encoding='utf-8-sig') as f:
-                        base_content = f.read()
-                    with open(mod_file_path, 'r', encoding='utf-8-sig') as f:
-                        mod_content = f.read()
-                    
-                    if self._quick_normalize(base_content) != self._quick_normalize(mod_content):
-                        return True
-                except Exception:
-                    return True
-        return False
-    
-    def _quick_normalize(self, content: str) -> str:
-        lines = []
-        for line in content.split('\n'):
-            if '#' in line:
-                line = line[:line.index('#')]
-            line = line.strip()
-            if line:
-                lines.append(line)
-        return ''.join(lines).replace(' ', '').replace('\t', '')
+    def on_changes_finished(self, base_path_str: str, base_has_files: bool, changes: dict):
+        # Сигнал приходит из run() - дожидаемся выхода, чтобы можно было запустить новую проверку
+        thread = self.changes_thread
+        thread.wait()
+        self._mod_changes_cache.update(
+            ((mod_path_str, base_path_str), result) for mod_path_str, result in changes.items()
+        )
+        # Результаты проверки модов прошлого сканирования в кэше остаются (ключ сам отсеет
+        # устаревшие), но проверенными не считаются - иначе их не перепроверить
+        if thread.scan_generation == self._scan_generation:
+            self._base_has_files[base_path_str] = base_has_files
+            self._checked_mods.setdefault(base_path_str, set()).update(changes)
+        # Пока шла проверка, база или выбор могли измениться - строим список заново;
+        # проверенные моды уже отмечены, повторно они в поток не уйдут
+        self._schedule_refresh()
+    
+    def _get_changes_executor(self) -> ThreadPoolExecutor:
+        """Пул потоков для проверки модов (один на окно, переиспользуется)"""
+        if self._changes_executor is None:
+            self._changes_executor = ThreadPoolExecutor(max_workers=min(os.cpu_count() or 1, 8))
+        return self._changes_executor
     
     def on_base_type_changed(self):
         is_vanilla = self.vanilla_radio.isChecked()
@@ -679,16 +1059,14 @@ class MainWindow(QMainWindow):
             if self.base_mod_index >= 0 and self.base_mod_index < len(self.base_mod_data):
                 self.base_path = self.base_mod_data[self.base_mod_index][1]
         
-        self._mod_changes_cache.clear()
-        self.refresh_available_list()
+        self._schedule_refresh()
         self.update_generate_button()
     
     def on_base_mod_changed(self, index):
         if index >= 0 and index < len(self.base_mod_data):
             self.base_mod_index = index
             self.base_path = self.base_mod_data[index][1]
-            self._mod_changes_cache.clear()
-            self.refresh_available_list()
+            self._schedule_refresh()
             self.update_generate_button()
     
     def select_base_mod(self):
@@ -735,55 +1113,124 @@ class MainWindow(QMainWindow):
             self.on_base_mod_changed(idx)
     
     def add_selected_mods(self):
-        for item in self.available_list.selectedItems():
-            mod = item.data(Qt.UserRole)
-            new_item = QListWidgetItem(f"{mod.name} ({tr('files_count', len(mod.files))})")
-            new_item.setData(Qt.UserRole, mod)
-            self.selected_list.addItem(new_item)
-        
-        self.refresh_available_list()
+        selected_items = self.available_list.selectedItems()
+        self.selected_list.setUpdatesEnabled(False)
+        try:
+            for item in selected_items:
+                mod = item.data(Qt.UserRole)
+                new_item = QListWidgetItem(f"{mod.name} ({tr('files_count', len(mod.files))})")
+                new_item.setData(Qt.UserRole, mod)
+                self.selected_list.addItem(new_item)
+                self._selected_paths.add(mod.path)
+                self._selected_mods.append(mod)
+        finally:
+            self.selected_list.setUpdatesEnabled(True)
+        
+        # Убираем перенесённые строки без повторной проверки модов; с конца, чтобы не сдвигать индексы
+        for row in sorted((self.available_list.row(item) for item in selected_items), reverse=True):
+            self.available_list.takeItem(row)
+        self.statusBar().showMessage(tr("available_count", self.available_list.count()))
         self.update_selected_count()
         self.update_generate_button()
     
     def add_all_mods(self):
-        for i in range(self.available_list.count()):
-            item = self.available_list.item(i)
-            mod = item.data(Qt.UserRole)
-            new_item = QListWidgetItem(f"{mod.name} ({tr('files_count', len(mod.files))})")
-            new_item.setData(Qt.UserRole, mod)
-            self.selected_list.addItem(new_item)
+        self.selected_list.setUpdatesEnabled(False)
+        try:
+            for i in range(self.available_list.count()):
+                item = self.available_list.item(i)
+                mod = item.data(Qt.UserRole)
+                new_item = QListWidgetItem(f"{mod.name} ({tr('files_count', len(mod.files))})")
+                new_item.setData(Qt.UserRole, mod)
+                self.selected_list.addItem(new_item)
+                self._selected_paths.add(mod.path)
+                self._selected_mods.append(mod)
+        finally:
+            self.selected_list.setUpdatesEnabled(True)
         
-        self.refresh_available_list()
+        self.available_list.clear()
+        self.statusBar().showMessage(tr("available_count", 0))
         self.update_selected_count()
         self.update_generate_button()
     
     def remove_selected_mods(self):
+        removed_mods = []
         for item in self.selected_list.selectedItems():
-            self.selected_list.takeItem(self.selected_list.row(item))
+            mod = item.data(Qt.UserRole)
+            removed_mods.append(mod)
+            row = self.selected_list.row(item)
+            self.selected_list.takeItem(row)
+            del self._selected_mods[row]
+            if mod:
+                self._selected_paths.discard(mod.path)
         
-        self.refresh_available_list()
+        self._return_to_available(removed_mods)
         self.update_selected_count()
         self.update_generate_button()
     
     def remove_all_mods(self):
+        removed_mods = self._selected_mods
         self.selected_list.clear()
-        self.refresh_available_list()
+        self._selected_paths.clear()
+        self._selected_mods = []
+        self._return_to_available(removed_mods)
         self.update_selected_count()
         self.update_generate_button()
     
+    def _return_to_available(self, mods: List[ModInfo]):
+        """Возвращает снятые с выбора моды в список доступных без повторной проверки.
+        
+        Результаты сравнения с базой берутся из кэша; если для какого-то мода их нет,
+        список строится заново через refresh_available_list.
+        """
+        base_path = self._current_base_path()
+        mods = [mod for mod in mods if mod and not (base_path and mod.path == base_path)]
+        
+        if base_path and Path(base_path).exists():
+            base_has_files, has_changes_by_path, unchecked = self._lookup_changes(mods, str(base_path))
+            if base_has_files is None or unchecked:
+                self._schedule_refresh()
+                return
+            if base_has_files:
+                mods = [mod for mod in mods if has_changes_by_path[mod.path]]
+        
+        # Список доступных отсортирован по имени - вставляем каждый мод на его место
+        names = [self.available_list.item(i).data(Qt.UserRole).name.lower()
+                 for i in range(self.available_list.count())]
+        self.available_list.setUpdatesEnabled(False)
+        try:
+            for mod in mods:
+                name = mod.name.lower()
+                row = bisect_right(names, name)
+                names.insert(row, name)
+                self.available_list.insertItem(row, self._make_available_item(mod))
+        finally:
+            self.available_list.setUpdatesEnabled(True)
+        
+        self.statusBar().showMessage(tr("available_count", self.available_list.count()))
+    
     def move_up(self):
         current_row = self.selected_list.currentRow()
         if current_row > 0:
+            # Только перестановка: available_list не меняется, refresh не нужен
+            self.selected_list.blockSignals(True)
             item = self.selected_list.takeItem(current_row)
             self.selected_list.insertItem(current_row - 1, item)
+            self.selected_list.blockSignals(False)
             self.selected_list.setCurrentRow(current_row - 1)
+            mods = self._selected_mods
+            mods[current_row - 1], mods[current_row] = mods[current_row], mods[current_row - 1]
     
     def move_down(self):
         current_row = self.selected_list.currentRow()
-        if current_row < self.selected_list.count() - 1:
+        if 0 <= current_row < self.selected_list.count() - 1:
+            # Только перестановка: available_list не меняется, refresh не нужен
+            self.selected_list.blockSignals(True)
             item = self.selected_list.takeItem(current_row)
             self.selected_list.insertItem(current_row + 1, item)
+            self.selected_list.blockSignals(False)
             self.selected_list.setCurrentRow(current_row + 1)
+            mods = self._selected_mods
+            mods[current_row], mods[current_row + 1] = mods[current_row + 1], mods[current_row]
     
     def update_selected_count(self):
         self.selected_count_label.setText(tr("selected_count", self.selected_list.count()))
@@ -813,11 +1260,7 @@ class MainWindow(QMainWindow):
                 return
             output_path = Path(base_output) / safe_patch_name
         
-        mod_paths = []
-        for i in range(self.selected_list.count()):
-            item = self.selected_list.item(i)
-            mod = item.data(Qt.UserRole)
-            mod_paths.append(Path(mod.path))
+        mod_paths = [Path(mod.path) for mod in self._selected_mods]
         
         self.generate_btn.setEnabled(False)
         self.progress_bar.setVisible(True)
@@ -839,12 +1282,8 @@ class MainWindow(QMainWindow):
         self.generate_btn.setEnabled(True)
         self.progress_bar.setVisible(False)
         
-        if stats.errors:
-            for e in stats.errors:
-                self.log(e, "error")
-        
-        for w in stats.warnings:
-            self.log(w, "warning")
+        self.log_many(stats.errors, "error")
+        self.log_many(stats.warnings, "warning")
         
         if stats.failed_files == 0:
             self.log(tr("patch_success_log", stats.merged_files, stats.skipped_files), "success")
@@ -863,132 +1302,138 @@ class MainWindow(QMainWindow):
     def show_documentation(self):
         """Открыть документацию на текущем языке"""
         import webbrowser
-        import tempfile
-        
-        # Определяем путь к документации
-        lang = i18n.current_language
-        
-        # Ищем файл документации
-        possible_paths = [
-            # При запуске из исходников
-            Path(__file__).parent.parent.parent / "resources" / "docs" / f"README_{lang}.md",
-            Path(__file__).parent.parent.parent / "resources" / "docs" / "README_en.md",
-            # При запуске из exe (PyInstaller)
-            Path(sys.executable).parent / "resources" / "docs" / f"README_{lang}.md",
-            Path(sys.executable).parent / "resources" / "docs" / "README_en.md",
-            # Альтернативный путь для PyInstaller
-            Path(getattr(sys, '_MEIPASS', '')) / "resources" / "docs" / f"README_{lang}.md" if hasattr(sys, '_MEIPASS') else None,
-            Path(getattr(sys, '_MEIPASS', '')) / "resources" / "docs" / "README_en.md" if hasattr(sys, '_MEIPASS') else None,
-        ]
         
-        doc_path = None
-        for p in possible_paths:
-            if p and p.exists():
-                doc_path = p
-                break
+        doc_path = _resolve_doc_path(i18n.current_language)
         
         if doc_path:
             # Конвертируем markdown в простой HTML и открываем в браузере
             try:
-                with open(doc_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
+                # Готовый HTML кэшируется по mtime документа и версии программы
+                cache_dir = self.get_doc_cache_dir()
+                mtime = doc_path.stat().st_mtime_ns
+                html_path = cache_dir / f"{doc_path.stem}_{mtime}_{__version__}.html"
                 
-                # Простая конвертация markdown в HTML
-                html = self._markdown_to_html(content)
-                
-                # Сохраняем во временный файл и открываем
-                with tempfile.NamedTemporaryFile('w', suffix='.html', delete=False, encoding='utf-8') as f:
-                    f.write(html)
-                    temp_path = f.name
+                if not html_path.exists():
+                    # Простая конвертация markdown в HTML - построчно прямо в файл,
+                    # без промежуточной строки со всем документом
+                    tmp_path = html_path.with_name(html_path.name + '.tmp')
+                    try:
+                        with open(doc_path, 'r', encoding='utf-8') as src, \
+                                open(tmp_path, 'w', encoding='utf-8', newline='') as out:
+                            self._markdown_to_html(src, out)
+                        os.replace(tmp_path, html_path)
+                    except Exception:
+                        tmp_path.unlink(missing_ok=True)
+                        raise
+                    
+                    # Удаляем устаревшие версии этого документа
+                    for old_path in cache_dir.glob(f"{doc_path.stem}_*.html"):
+                        if old_path != html_path:
+                            old_path.unlink(missing_ok=True)
                 
-                webbrowser.open(f'file://{temp_path}')
+                webbrowser.open(html_path.as_uri())
                 
             except Exception as e:
                 self.log(f"Error opening documentation: {e}", "error")
         else:
             QMessageBox.warning(self, tr("error"), tr("doc_not_found"))
     
-    def _markdown_to_html(self, md: str) -> str:
-        """Простая конвертация markdown в HTML"""
-        import re
-        
-        html = md
-        
-        # Заголовки
-        html = re.sub(r'^### (.+)$', r'<h3>\1</h3>', html, flags=re.MULTILINE)
-        html = re.sub(r'^## (.+)$', r'<h2>\1</h2>', html, flags=re.MULTILINE)
-        html = re.sub(r'^# (.+)$', r'<h1>\1</h1>', html, flags=re.MULTILINE)
-        
-        # Жирный и курсив
-        html = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', html)
-        html = re.sub(r'\*(.+?)\*', r'<em>\1</em>', html)
-        
-        # Код
-        html = re.sub(r'```(\w*)\n(.*?)```', r'<pre><code>\2</code></pre>', html, flags=re.DOTALL)
-        html = re.sub(r'`(.+?)`', r'<code>\1</code>', html)
-        
-        # Ссылки
-        html = re.sub(r'\[(.+?)\]\((.+?)\)', r'<a href="\2">\1</a>', html)
-        
-        # Списки
-        html = re.sub(r'^\- (.+)$', r'<li>\1</li>', html, flags=re.MULTILINE)
-        
-        # Горизонтальная линия
-        html = re.sub(r'^---$', r'<hr>', html, flags=re.MULTILINE)
-        
-        # Параграфы
-        html = re.sub(r'\n\n', r'</p><p>', html)
-        
-        # Таблицы - простая обработка
-        lines = html.split('\n')
-        in_table = False
-        result = []
-        for line in lines:
-            if '|' in line and not line.strip().startswith('<'):
+    def _markdown_to_html(self, md: Iterable[str], out: TextIO):
+        """Простая конвертация markdown в HTML (один проход по строкам)
+        
+        Строки md читаются по одной, HTML сразу пишется в out.
+        """
+        from html import escape
+        
+        def emit(piece: str):
+            out.write(piece)
+            out.write('\n')
+        
+        paragraph = []
+        code_lines = []
+        in_fence = in_table = in_list = False
+        
+        def close_blocks():
+            nonlocal in_table, in_list
+            if paragraph:
+                emit('<p>' + '\n'.join(paragraph) + '</p>')
+                paragraph.clear()
+            if in_table:
+                emit('</table>')
+                in_table = False
+            if in_list:
+                emit('</ul>')
+                in_list = False
+        
+        out.write(_DOC_HTML_HEAD)
+        for line in md:
+            line = line.rstrip('\r\n')
+            stripped = line.strip()
+            
+            # Код внутри ``` выводим как есть, без разметки
+            if in_fence:
+                if stripped.startswith('```'):
+                    emit('<pre><code>' + '\n'.join(code_lines) + '</code></pre>')
+                    code_lines.clear()
+                    in_fence = False
+                else:
+                    code_lines.append(escape(line, quote=False))
+                continue
+            
+            if not stripped:
+                close_blocks()
+                continue
+            
+            first = stripped[0]
+            heading = _MD_HEADING_RE.match(line) if first == '#' else None
+            if first == '`' and stripped.startswith('```'):
+                close_blocks()
+                in_fence = True
+            elif first == '|':
+                # Таблицы - простая обработка
                 if not in_table:
-                    result.append('<table border="1" cellpadding="5" cellspacing="0">')
+                    close_blocks()
+                    emit('<table border="1" cellpadding="5" cellspacing="0">')
                     in_table = True
-                if line.strip().startswith('|--') or line.strip().startswith('| --'):
-                    continue  # Пропускаем разделитель таблицы
-                cells = [c.strip() for c in line.split('|')[1:-1]]
-                result.append('<tr>' + ''.join(f'<td>{c}</td>' for c in cells) + '</tr>')
+                if stripped.strip('|-: '):
+                    cells = [c.strip() for c in stripped.split('|')[1:-1]]
+                    emit('<tr>' + ''.join(f'<td>{_md_inline(c)}</td>' for c in cells) + '</tr>')
+                # иначе это разделитель заголовка таблицы - пропускаем
+            elif heading:
+                close_blocks()
+                level = len(heading.group(1))
+                emit(f'<h{level}>{_md_inline(heading.group(2))}</h{level}>')
+            elif stripped == '---':
+                close_blocks()
+                emit('<hr>')
+            elif first == '-' and stripped.startswith('- '):
+                if not in_list:
+                    close_blocks()
+                    emit('<ul>')
+                    in_list = True
+                emit(f'<li>{_md_inline(stripped[2:])}</li>')
             else:
-                if in_table:
-                    result.append('</table>')
-                    in_table = False
-                result.append(line)
-        if in_table:
-            result.append('</table>')
-        html = '\n'.join(result)
-        
-        # Оборачиваем в HTML документ
-        return f'''<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <title>Paradox Mod Patcher - Documentation</title>
-    <style>
-        body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif; 
-               max-width: 900px; margin: 40px auto; padding: 20px; line-height: 1.6; }}
-        h1, h2, h3 {{ color: #333; }}
-        code {{ background: #f4f4f4; padding: 2px 6px; border-radius: 3px; }}
-        pre {{ background: #f4f4f4; padding: 15px; border-radius: 5px; overflow-x: auto; }}
-        table {{ border-collapse: collapse; margin: 15px 0; }}
-        td, th {{ padding: 8px 12px; border: 1px solid #ddd; }}
-        a {{ color: #0066cc; }}
-        hr {{ border: none; border-top: 1px solid #ddd; margin: 30px 0; }}
-        li {{ margin: 5px 0; }}
-    </style>
-</head>
-<body>
-<p>{html}</p>
-</body>
-</html>'''
+                if in_table or in_list:
+                    close_blocks()
+                paragraph.append(_md_inline(line))
+        
+        if in_fence:
+            emit('<pre><code>' + '\n'.join(code_lines) + '</code></pre>')
+        close_blocks()
+        out.write(_DOC_HTML_TAIL)
+    
+    def get_doc_cache_dir(self) -> Path:
+        cache_dir = Path.home() / ".paradox_mod_patcher" / "doc_cache"
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        return cache_dir
     
     def get_profiles_dir(self) -> Path:
-        profiles_dir = Path.home() / ".paradox_mod_patcher" / "profiles"
-        profiles_dir.mkdir(parents=True, exist_ok=True)
-        return profiles_dir
+        # Папку создаём один раз - дальше путь берётся из атрибута без обращений к диску
+        if self._profiles_dir is None:
+            profiles_dir = Path.home() / ".paradox_mod_patcher" / "profiles"
+            profiles_dir.mkdir(parents=True, exist_ok=True)
+            self._profiles_dir = profiles_dir
+        return self._profiles_dir
     
     def save_profile(self):
         profile_data = {
@@ -996,25 +1441,46 @@ class MainWindow(QMainWindow):
             "base_is_vanilla": self.vanilla_radio.isChecked(),
             "base_mod_name": self.base_mod_label.text() if self.mod_radio.isChecked() else "",
             "vanilla_path": self.vanilla_path_label.text(),
-            "selected_mods": [],
+            "selected_mods": [mod.name for mod in self._selected_mods],
             "patch_name": self.patch_name_edit.currentText()
         }
         
-        for i in range(self.selected_list.count()):
-            item = self.selected_list.item(i)
-            mod = item.data(Qt.UserRole)
-            profile_data["selected_mods"].append(mod.name)
-        
         name, ok = QInputDialog.getText(self, tr("save_profile_title"), tr("profile_name_prompt"),
                                         text=self.patch_name_edit.currentText())
         
         if ok and name:
             profile_path = self.get_profiles_dir() / f"{name}.json"
-            with open(profile_path, 'w', encoding='utf-8') as f:
-                json.dump(profile_data, f, ensure_ascii=False, indent=2)
-            
-            self.add_recent_profile(str(profile_path))
-            self.log(tr("profile_saved", name), "success")
+            self._start_profile_io(ProfileIOThread(profile_path, profile_data), self.on_profile_saved)
+    
+    def on_profile_saved(self, profile_path: str, _data, error: str):
+        if error:
+            self.log(f"{tr('error')}: {error}", "error")
+            return
+        self.add_recent_profile(profile_path)
+        self.log(tr("profile_saved", Path(profile_path).stem), "success")
+    
+    def _start_profile_io(self, thread: ProfileIOThread, on_finished):
+        # Операции с профилями короткие - предыдущую дожидаемся и применяем её результат
+        self._finish_profile_io()
+        self.profile_thread = thread
+        self._on_profile_io_finished = on_finished
+        thread.finished.connect(self._finish_profile_io)
+        thread.start()
+    
+    def _finish_profile_io(self, *_args):
+        """Дожидается текущей операции с профилем и применяет её результат ровно один раз.
+        
+        Вызывается сигналом finished, а также напрямую - перед новой операцией и при
+        закрытии окна; сигнал, пришедший после прямого вызова, ничего не делает.
+        """
+        thread = self.profile_thread
+        if thread is None:
+            return
+        thread.wait()
+        self.profile_thread = None
+        on_finished, self._on_profile_io_finished = self._on_profile_io_finished, None
+        if thread.result is not None and on_finished:
+            on_finished(*thread.result)
     
     def load_profile(self, profile_path: str = None):
         if not profile_path:
@@ -1024,10 +1490,15 @@ class MainWindow(QMainWindow):
         if not profile_path or not Path(profile_path).exists():
             return
         
+        # Файл читаем в потоке, виджеты заполняем в on_profile_loaded
+        self._start_profile_io(ProfileIOThread(Path(profile_path)), self.on_profile_loaded)
+    
+    def on_profile_loaded(self, profile_path: str, profile_data, error: str):
+        if error:
+            self.log(tr("profile_load_error", error), "error")
+            return
+        
         try:
-            with open(profile_path, 'r', encoding='utf-8') as f:
-                profile_data = json.load(f)
-            
             mods_path = profile_data.get("mods_path", "")
             if mods_path and mods_path != tr("not_selected"):
                 self.mods_path_label.setText(mods_path)
@@ -1046,25 +1517,29 @@ class MainWindow(QMainWindow):
             else:
                 self.mod_radio.setChecked(True)
                 base_mod_name = profile_data.get("base_mod_name", "")
-                if base_mod_name:
-                    # Ищем мод по имени в списке
-                    for idx, (name, path) in enumerate(self.base_mod_data):
-                        if name == base_mod_name:
-                            self.base_mod_index = idx
-                            self.base_mod_label.setText(name)
-                            self.on_base_mod_changed(idx)
-                            break
+                idx = self._base_mod_by_name.get(base_mod_name) if base_mod_name else None
+                if idx is not None:
+                    self.base_mod_index = idx
+                    self.base_mod_label.setText(base_mod_name)
+                    self.on_base_mod_changed(idx)
             
-            self.selected_list.clear()
-            for mod_name in profile_data.get("selected_mods", []):
-                for mod in self.all_mods:
-                    if mod.name == mod_name:
+            self.selected_list.setUpdatesEnabled(False)
+            try:
+                self.selected_list.clear()
+                self._selected_paths.clear()
+                self._selected_mods = []
+                for mod_name in profile_data.get("selected_mods", []):
+                    mod = self._mod_by_name.get(mod_name)
+                    if mod:
                         item = QListWidgetItem(f"{mod.name} ({tr('files_count', len(mod.files))})")
                         item.setData(Qt.UserRole, mod)
                         self.selected_list.addItem(item)
-                        break
+                        self._selected_paths.add(mod.path)
+                        self._selected_mods.append(mod)
+            finally:
+                self.selected_list.setUpdatesEnabled(True)
             
-            self.refresh_available_list()
+            self._schedule_refresh()
             self.update_selected_count()
             self.update_generate_button()
             
@@ -1078,11 +1553,22 @@ class MainWindow(QMainWindow):
         except Exception as e:
             self.log(tr("profile_load_error", str(e)), "error")
     
-    def add_recent_profile(self, profile_path: str):
+    def _recent_profiles(self) -> List[str]:
+        """Список недавних профилей из QSettings.
+        
+        Список из одного элемента QSettings (реестр Windows, ini) возвращает строкой,
+        причём при каждом чтении - поэтому приводим к списку здесь, а не один раз при старте.
+        """
         recent = self.settings.value("recent_profiles", [])
         if isinstance(recent, str):
-            recent = [recent] if recent else []
+            return [recent] if recent else []
+        return list(recent or [])
+    
+    def add_recent_profile(self, profile_path: str):
+        recent = self._recent_profiles()
         
+        # Профиль только что сохранён или прочитан - проверим заново
+        self._recent_exists_cache.pop(profile_path, None)
         if profile_path in recent:
             recent.remove(profile_path)
         recent.insert(0, profile_path)
@@ -1091,12 +1577,23 @@ class MainWindow(QMainWindow):
         self.settings.setValue("recent_profiles", recent)
         self.update_recent_profiles_menu()
     
+    def _profile_exists(self, profile_path: str) -> bool:
+        """os.path.exists с запоминанием на 30 секунд.
+        
+        Меню недавних пересобирается часто, а профили могут лежать на медленном (сетевом) диске.
+        """
+        now = time.monotonic()
+        cached = self._recent_exists_cache.get(profile_path)
+        if cached and now - cached[0] < 30:
+            return cached[1]
+        exists = os.path.exists(profile_path)
+        self._recent_exists_cache[profile_path] = (now, exists)
+        return exists
+    
     def update_recent_profiles_menu(self):
         self.recent_profiles_menu.clear()
         
-        recent = self.settings.value("recent_profiles", [])
-        if isinstance(recent, str):
-            recent = [recent] if recent else []
+        recent = self._recent_profiles()
         
         if not recent:
             action = QAction(tr("menu_empty"), self)
@@ -1105,7 +1602,7 @@ class MainWindow(QMainWindow):
             return
         
         for profile_path in recent:
-            if Path(profile_path).exists():
+            if self._profile_exists(profile_path):
                 name = Path(profile_path).stem
                 action = QAction(name, self)
                 action.setData(profile_path)
@@ -13,22 +13,57 @@ Paradox Mod Patcher
 
 import sys
 import os
+import re
 
 # Добавляем src в путь
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
+_QSS_WS_RE = re.compile(r'/\*.*?\*/|\s+', re.S)
+
+
+def _load_stylesheet() -> str:
+    """Загрузить gui/app.qss без комментариев и лишних пробелов
+    
+    Qt разбирает стиль при полировке каждого виджета - короче строка, меньше работы.
+    """
+    base_dir = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    try:
+        with open(os.path.join(base_dir, 'gui', 'app.qss'), encoding='utf-8') as f:
+            qss = f.read()
+    except OSError:
+        return ""
+    return _QSS_WS_RE.sub(' ', qss).strip()
+
+
+def _splash_pixmap_path() -> str:
+    """Путь к картинке заставки (в сборке ресурсы лежат в sys._MEIPASS)"""
+    if hasattr(sys, '_MEIPASS'):
+        base_dir = sys._MEIPASS
+    else:
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_dir, 'resources', 'icons', 'app.png')
+
 
 def main():
     """Точка входа приложения"""
-    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtWidgets import QApplication, QSplashScreen
     from PyQt5.QtCore import Qt
-    from PyQt5.QtGui import QFont
+    from PyQt5.QtGui import QFont, QPixmap
     
     # Высокое DPI
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
     
     app = QApplication(sys.argv)
+    
+    # Заставка до импорта GUI - окно появляется сразу, даже на медленном диске
+    splash = None
+    pixmap = QPixmap(_splash_pixmap_path())
+    if not pixmap.isNull():
+        splash = QSplashScreen(pixmap)
+        splash.show()
+        app.processEvents()
+    
     app.setApplicationName("Paradox Mod Patcher")
     app.setApplicationVersion("2.0.0")
     app.setOrganizationName("ParadoxModPatcher")
@@ -41,75 +76,7 @@ def main():
     app.setFont(font)
     
     # Стили
-    app.setStyleSheet("""
-        QMainWindow {
-            background: #f5f5f5;
-        }
-        QGroupBox {
-            font-weight: bold;
-            border: 1px solid #cccccc;
-            border-radius: 5px;
-            margin-top: 10px;
-            padding-top: 10px;
-        }
-        QGroupBox::title {
-            subcontrol-origin: margin;
-            left: 10px;
-            padding: 0 5px;
-        }
-        QListWidget, QTreeWidget, QListView {
-            border: 1px solid #cccccc;
-            border-radius: 3px;
-            background: white;
-        }
-        QListWidget::item:selected, QTreeWidget::item:selected, QListView::item:selected {
-            background: #0078d4;
-            color: white;
-        }
-        QListWidget::item:hover, QTreeWidget::item:hover, QListView::item:hover {
-            background: #e5f3ff;
-        }
-        QListWidget::item:selected:hover, QTreeWidget::item:selected:hover, QListView::item:selected:hover {
-            background: #0078d4;
-            color: white;
-        }
-        QPushButton {
-            padding: 5px 15px;
-            border: 1px solid #cccccc;
-            border-radius: 3px;
-            background: white;
-        }
-        QPushButton:hover {
-            background: #e5e5e5;
-            border-color: #999999;
-        }
-        QPushButton:pressed {
-            background: #d0d0d0;
-        }
-        QComboBox {
-            padding: 5px;
-            border: 1px solid #cccccc;
-            border-radius: 3px;
-            background: white;
-        }
-        QComboBox QAbstractItemView {
-            border: 1px solid #cccccc;
-            background: white;
-            selection-background-color: #0078d4;
-            selection-color: white;
-        }
-        QComboBox QAbstractItemView::item:hover {
-            background: #e5f3ff;
-        }
-        QProgressBar {
-            border: 1px solid #cccccc;
-            border-radius: 3px;
-            text-align: center;
-        }
-        QProgressBar::chunk {
-            background: #4CAF50;
-        }
-    """)
+    app.setStyleSheet(_load_stylesheet())
     
     # Главное окно
     try:
@@ -118,6 +85,8 @@ def main():
         from src.gui.main_window import MainWindow
     window = MainWindow()
     window.show()
+    if splash is not None:
+        splash.finish(window)
     
     sys.exit(app.exec_())
 
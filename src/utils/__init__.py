@@ -1,18 +1,22 @@
 """Utility functions"""
 
 
+_INVALID_FILENAME_CHARS = '<>:"/\\|?*'
+_SAFE_FILENAME_TABLE = str.maketrans({char: '_' for char in _INVALID_FILENAME_CHARS})
+
+
 def safe_filename(name: str) -> str:
     """Преобразует строку в безопасное имя файла"""
-    invalid_chars = '<>:"/\\|?*'
-    for char in invalid_chars:
-        name = name.replace(char, '_')
-    return name
+    return name.translate(_SAFE_FILENAME_TABLE)
+
+
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
 
 
 def format_size(size_bytes: int) -> str:
     """Форматирует размер в человекочитаемый вид"""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_bytes < 1024:
-            return f"{size_bytes:.1f} {unit}"
-        size_bytes /= 1024
-    return f"{size_bytes:.1f} TB"
+    if size_bytes < 1024:
+        return f"{size_bytes:.1f} B"
+    # Каждая следующая единица - это ещё 10 бит
+    unit_index = min(len(_SIZE_UNITS) - 1, (int(size_bytes).bit_length() - 1) // 10)
+    return f"{size_bytes / (1 << (unit_index * 10)):.1f} {_SIZE_UNITS[unit_index]}"